@@ -1,6 +1,7 @@
 #!/bin/bash
 
 set -e
+shopt -s extglob
 
 if [ -z "${HOME_DIR}" ] && [ -n "${TEST_MODE}" ]; then
     HOME_DIR=/tmp/crontab-docker-testing
@@ -15,14 +16,14 @@ fi
 # Ensure dir exist - in case of volume mapping.
 # This needs to run as root to set proper permissions
 if [ "$(id -u)" = "0" ]; then
-    mkdir -p "${HOME_DIR}"/jobs "${HOME_DIR}"/crontabs
+    mkdir -p "${HOME_DIR}"/jobs "${HOME_DIR}"/crontabs "${HOME_DIR}"/compiled "${HOME_DIR}"/state
     # Only chown the directories we create, not the entire HOME_DIR (to avoid issues with read-only mounts)
-    chown docker:docker "${HOME_DIR}"/jobs "${HOME_DIR}"/crontabs 2>/dev/null || true
+    chown docker:docker "${HOME_DIR}"/jobs "${HOME_DIR}"/crontabs "${HOME_DIR}"/compiled "${HOME_DIR}"/state 2>/dev/null || true
     # Try to chown HOME_DIR itself, but ignore errors for read-only mounts
     chown docker:docker "${HOME_DIR}" 2>/dev/null || true
 else
     # If not root, try to create directories (may fail if permissions are wrong)
-    mkdir -p "${HOME_DIR}"/jobs "${HOME_DIR}"/crontabs 2>/dev/null || {
+    mkdir -p "${HOME_DIR}"/jobs "${HOME_DIR}"/crontabs "${HOME_DIR}"/compiled "${HOME_DIR}"/state 2>/dev/null || {
         echo "Warning: Cannot create ${HOME_DIR} directories. Ensure proper volume permissions."
         echo "Run: sudo chown -R $(id -u docker):$(id -g docker) /path/to/host/directory"
     }
@@ -32,275 +33,1165 @@ if [ -z "${DOCKER_HOST}" ] && [ -n "${DOCKER_PORT_2375_TCP}" ]; then
     export DOCKER_HOST="tcp://docker:2375"
 fi
 
-normalize_config() {
-    JSON_CONFIG={}
-    if [ -f "${HOME_DIR}/config.json" ]; then
-        JSON_CONFIG="$(cat "${HOME_DIR}"/config.json)"
-    elif [ -f "${HOME_DIR}/config.toml" ]; then
-        JSON_CONFIG="$(yq -p toml -o json < "${HOME_DIR}/config.toml")"
-    elif [ -f "${HOME_DIR}/config.yml" ]; then
-        JSON_CONFIG="$(yq -o json < "${HOME_DIR}/config.yml")"
-    elif [ -f "${HOME_DIR}/config.yaml" ]; then
-        JSON_CONFIG="$(yq -o json < "${HOME_DIR}/config.yaml")"
-    else
-        echo "Warning: No config file found in ${HOME_DIR}. Checked config.json, config.toml, config.yml, config.yaml"
+export CONFIG=${HOME_DIR}/config.working.json
+COMPILED_DIR="${HOME_DIR}/compiled"
+STATE_DIR="${HOME_DIR}/state"
+ZONEINFO_DIR=/usr/share/zoneinfo
+
+# Locate the config files to use: the first of config.json, config.toml,
+# config.yml and config.yaml, followed by every fragment in conf.d/ in
+# lexical order. Later sources take precedence over earlier ones.
+find_config() {
+    CONFIG_SOURCES=()
+    for candidate in config.json config.toml config.yml config.yaml; do
+        if [ -f "${HOME_DIR}/${candidate}" ]; then
+            CONFIG_SOURCES+=("${HOME_DIR}/${candidate}")
+            break
+        fi
+    done
+    for fragment in "${HOME_DIR}"/conf.d/*; do
+        case "${fragment}" in
+            *.json | *.toml | *.yml | *.yaml)
+                if [ -f "${fragment}" ]; then
+                    CONFIG_SOURCES+=("${fragment}")
+                fi
+                ;;
+        esac
+    done
+}
+
+# Convert a TOML/YAML config source to JSON under compiled/parsed/. The
+# converted file carries the source's mtime and is reused while they match.
+parse_config_source() {
+    local parsed="${COMPILED_DIR}/parsed/${1#"${HOME_DIR}"/}.json"
+    if [ -f "${parsed}" ] && [ ! "${1}" -nt "${parsed}" ] && [ ! "${1}" -ot "${parsed}" ]; then
+        return
     fi
+    mkdir -p "$(dirname "${parsed}")"
+    case "${1}" in
+        *.toml)
+            yq -p toml -o json < "${1}" > "${parsed}.tmp"
+            ;;
+        *)
+            yq -o json < "${1}" > "${parsed}.tmp"
+            ;;
+    esac
+    touch -r "${1}" "${parsed}.tmp"
+    mv "${parsed}.tmp" "${parsed}"
+}
 
-    jq -S -r 'if type == "array" then .
-    else (."~~shared-settings" // {}) as $shared | del(."~~shared-settings") | to_entries | map_values($shared + .value + { name: .key })
-    end' <<< "${JSON_CONFIG}" > "${HOME_DIR}"/config.working.json
+# Remove the conversions under compiled/parsed/ of sources that are gone,
+# keeping the documents given as arguments.
+prune_parsed_sources() {
+    local -A live_documents=()
+    local document parsed
+    for document in "${@}"; do
+        live_documents["${document}"]=1
+    done
+    for parsed in "${COMPILED_DIR}"/parsed/*.json "${COMPILED_DIR}"/parsed/conf.d/*.json; do
+        if [ -f "${parsed}" ] && [ -z "${live_documents[${parsed}]}" ]; then
+            rm -f "${parsed}"
+        fi
+    done
 }
 
-slugify() {
-    echo "${@}" | iconv -t ascii | sed -r s/[~^]+//g | sed -r s/[^a-zA-Z0-9]+/-/g | sed -r s/^-+\|-+$//g | tr '[:upper:]' '[:lower:]'
+# The number of parallel workers used to parse config sources and write job
+# scripts, from COMPILE_WORKERS (defaults to the number of CPUs), in WORKERS.
+compile_workers() {
+    if [ -n "${WORKERS}" ]; then
+        return
+    fi
+    WORKERS=${COMPILE_WORKERS}
+    if [[ "${WORKERS}" != [1-9]*([0-9]) ]]; then
+        if [ -n "${WORKERS}" ]; then
+            echo "Warning: COMPILE_WORKERS must be a positive integer, using the number of CPUs" >&2
+        fi
+        WORKERS=$(nproc)
+    fi
 }
 
-make_image_cmd() {
-    DOCKERARGS=$(echo "${1}" | jq -r .dockerargs)
-    ENVIRONMENT=$(echo "${1}" | jq -r 'select(.environment != null) | .environment | map("--env " + .) | join(" ")')
-    EXPOSE=$(echo "${1}" | jq -r 'select(.expose != null) | .expose | map("--expose " + .) | join(" ")' )
-    NAME=$(echo "${1}" | jq -r 'select(.name != null) | .name')
-    NETWORKS=$(echo "${1}" | jq -r 'select(.networks != null) | .networks | map("--network " + .) | join(" ")')
-    PORTS=$(echo "${1}" | jq -r 'select(.ports != null) | .ports | map("--publish " + .) | join(" ")')
-    VOLUMES=$(echo "${1}" | jq -r 'select(.volumes != null) | .volumes | map("--volume " + .) | join(" ")')
+# Turn the stream events of one or more JSON documents back into their
+# top-level entries, one at a time, as { key, value } objects. Mapping
+# documents yield their keys, array documents yield index 0 for every item,
+# and null or scalar documents (yq turns an empty YAML file into null) yield
+# nothing.
+# Every event is passed through f first, which can drop or flatten the parts
+# of values that are not needed. settings_key tells ~~shared-settings and
+# ~~profiles.<name> keys apart from job keys.
+NORMALIZE_JQ='
+def entries(f):
+    fromstream(inputs
+        | select(.[0] != [])
+        | f
+        | if (.[0] | length) > 0 and (.[0][0] | type) == "number" then .[0][0] = 0 else . end
+        | if length == 2 then ., (if (.[0] | length) == 1 then [.[0]] else empty end)
+          elif (.[0] | length) == 2 then [.[0][:1]]
+          elif (.[0] | length) == 1 then empty
+          else .
+          end)
+    | to_entries[];
+def settings_key: type == "string" and (. == "~~shared-settings" or startswith("~~profiles."));
+'
 
-    if [ "${DOCKERARGS}" == "null" ]; then DOCKERARGS=; fi
-    # Add --rm unless already specified in dockerargs
-    if ! echo "${DOCKERARGS}" | grep -q -- '--rm'; then
-        DOCKERARGS="--rm ${DOCKERARGS}"
+normalize_config() {
+    find_config
+    if [ ${#CONFIG_SOURCES[@]} -eq 0 ]; then
+        echo "Warning: No config file found in ${HOME_DIR}. Checked config.json, config.toml, config.yml, config.yaml and conf.d/"
+        : > "${CONFIG}.tmp"
+        echo '{"shared":{},"profiles":{},"last":{},"errors":{}}' > "${COMPILED_DIR}/settings.json.tmp"
+        prune_parsed_sources
+        commit_normalized_config
+        return
     fi
-    DOCKERARGS+=" "
-    if [ -n "${ENVIRONMENT}" ]; then DOCKERARGS+="${ENVIRONMENT} "; fi
-    if [ -n "${EXPOSE}" ]; then DOCKERARGS+="${EXPOSE} "; fi
-    if [ -n "${NAME}" ]; then DOCKERARGS+="--name \"${NAME}\" "; fi
-    if [ -n "${NETWORKS}" ]; then DOCKERARGS+="${NETWORKS} "; fi
-    if [ -n "${PORTS}" ]; then DOCKERARGS+="${PORTS} "; fi
-    if [ -n "${VOLUMES}" ]; then DOCKERARGS+="${VOLUMES} "; fi
 
-    IMAGE=$(echo "${1}" | jq -r .image | envsubst)
-    if [ "${IMAGE}" == "null" ]; then return; fi
+    # Convert all non-JSON sources, up to COMPILE_WORKERS at a time
+    local documents=() parsers=0
+    compile_workers
+    for source in "${CONFIG_SOURCES[@]}"; do
+        case "${source}" in
+            *.json)
+                documents+=("${source}")
+                ;;
+            *)
+                if [ "${parsers}" -ge "${WORKERS}" ]; then
+                    wait -n
+                    parsers=$((parsers - 1))
+                fi
+                parse_config_source "${source}" &
+                parsers=$((parsers + 1))
+                documents+=("${COMPILED_DIR}/parsed/${source#"${HOME_DIR}"/}.json")
+                ;;
+        esac
+    done
+    while [ "${parsers}" -gt 0 ]; do
+        wait -n
+        parsers=$((parsers - 1))
+    done
+    prune_parsed_sources "${documents[@]}"
 
-    COMMAND=$(echo "${1}" | jq -r .command)
-    if [ "${COMMAND}" == "null" ]; then return; fi
+    # Merge the documents as event streams so that no document is ever held in
+    # memory as a whole. The first pass collects ~~shared-settings, resolves
+    # the ~~profiles.<name> inheritance chains once and, if there are several
+    # documents, finds the last one defining each mapping job. Broken profiles
+    # and shared settings are recorded under errors by their key, so that
+    # compile_jobs reports them and only fails the jobs that use them. The second pass
+    # writes one job per line; settings and profiles are applied by compile_jobs.
+    # Both write to temporary files, which only replace the previous ones once
+    # both passes have succeeded.
+    jq -n -c --stream --argjson sources ${#documents[@]} "${NORMALIZE_JQ}"'
+        def shallow: if .[0][0] | settings_key then .
+            elif $sources == 1 then empty
+            elif (.[0] | length) <= 2 then .
+            elif length == 2 then [.[0][:2], null]
+            else empty
+            end;
+        def parents: .extends // [] | if type == "string" then [.] else . end;
+        def resolve_profiles:
+            . as $defined
+            | def resolve($name; $chain):
+                if (.profiles | has($name)) or (.errors | has($name)) then .
+                elif any($chain[]; . == $name) then .errors[$name] = "profile inheritance cycle: \($chain + [$name] | join(" -> "))"
+                elif ($defined[$name] | type) != "object" then .errors[$name] = "profile must be a mapping"
+                elif $defined[$name].extends | . != null and type != "string" and (type != "array" or any(.[]; type != "string")) then
+                    .errors[$name] = "extends must be a profile name or an array of profile names"
+                else ($defined[$name] | parents) as $parents
+                    | reduce ($parents[] | select(. as $parent | $defined | has($parent))) as $parent (.; resolve($parent; $chain + [$name]))
+                    | . as $resolved
+                    | ([$parents[] as $parent
+                        | if $defined | has($parent) | not then "extends refers to unknown profile \($parent | tojson)"
+                          elif $resolved.errors | has($parent) then "extends refers to invalid profile \($parent | tojson)"
+                          else empty
+                          end] | first) as $error
+                    | if .errors | has($name) then .
+                      elif $error != null then .errors[$name] = $error
+                      else .profiles[$name] = (reduce $parents[] as $parent ({}; . + $resolved.profiles[$parent]) + ($defined[$name] | del(.extends)))
+                      end
+                end;
+              reduce ($defined | keys_unsorted[]) as $name ({ profiles: {}, errors: {} }; resolve($name; []));
+        reduce entries(shallow) as $entry ({ shared: {}, profiles: {}, last: {}, errors: {} };
+            if ($entry.key | type) == "number" then .
+            elif $entry.key == "~~shared-settings" then
+                if ($entry.value | type) == "object" then .shared += $entry.value
+                else .errors["~~shared-settings"] = "shared settings must be a mapping"
+                end
+            elif $entry.key | startswith("~~profiles.") then .profiles[$entry.key[11:]] = $entry.value
+            elif $sources == 1 then .
+            else .last[$entry.key] = input_filename
+            end)
+        | (.profiles | resolve_profiles) as $resolved
+        | .profiles = $resolved.profiles
+        | .errors += ($resolved.errors | with_entries(.key |= "~~profiles." + .))
+        ' "${documents[@]}" > "${COMPILED_DIR}/settings.json.tmp"
 
-    echo "docker run ${DOCKERARGS} \"${IMAGE}\" ${COMMAND}"
+    jq -n -c -S --stream --slurpfile settings "${COMPILED_DIR}/settings.json.tmp" "${NORMALIZE_JQ}"'
+        $settings[0] as $settings
+        | entries(.)
+        | if (.key | type) == "number" then .value
+          elif (.key | settings_key) or ($settings.last[.key] // input_filename) != input_filename then empty
+          else .value + { name: .key }
+          end' "${documents[@]}" > "${CONFIG}.tmp"
+    commit_normalized_config
 }
 
-make_container_cmd() {
-    DOCKERARGS=$(echo "${1}" | jq -r .dockerargs)
-    if [ "${DOCKERARGS}" == "null" ]; then DOCKERARGS=; fi
+# Move the normalized config and settings into place. When run as root, e.g.
+# for the first build, they are handed to the docker user so that reloads,
+# which run as docker, can replace them.
+commit_normalized_config() {
+    mv "${COMPILED_DIR}/settings.json.tmp" "${COMPILED_DIR}/settings.json"
+    mv "${CONFIG}.tmp" "${CONFIG}"
+    if [ "$(id -u)" = "0" ]; then
+        chown docker:docker "${COMPILED_DIR}/settings.json" "${CONFIG}" 2>/dev/null || true
+    fi
+}
 
-    CONTAINER=$(echo "${1}" | jq -r .container | envsubst)
-    if [ "${CONTAINER}" == "null" ]; then return; fi
+# Fingerprint everything the generated scripts depend on besides the job
+# definitions and the environment variables substituted into them: this
+# script, HOME_DIR and the compile options. It is mixed into every job script
+# hash.
+environment_fingerprint() {
+    {
+        cat "${BASH_SOURCE[0]}"
+        printf 'HOME_DIR=%s\n' "${HOME_DIR}"
+        printf 'RESOLVE_COMMAND_ENV=%s\n' "${RESOLVE_COMMAND_ENV:-false}"
+        printf 'SCHEDULER=%s\n' "${SCHEDULER:-crond}"
+        printf 'STRICT_VALIDATION=%s\n' "${STRICT_VALIDATION:-false}"
+    } | sha256sum | cut -d ' ' -f 1
+}
 
-    COMMAND=$(echo "${1}" | jq -r .command )
-    if [ "${COMMAND}" == "null" ]; then return; fi
+# Fingerprint the current values of the environment variables that the last
+# build substituted, as recorded per job in compiled/variables. Unset and
+# empty variables differ, since unset ones are left in place in commands.
+variables_fingerprint() {
+    local -A seen=()
+    local name vars var
+    if [ -f "${COMPILED_DIR}/variables" ]; then
+        while IFS=$'\t' read -r name vars; do
+            for var in ${vars}; do
+                seen["${var}"]=1
+            done
+        done < "${COMPILED_DIR}/variables"
+    fi
+    for var in "${!seen[@]}"; do
+        if [ -n "${!var+set}" ]; then
+            printf '%s=%s\n' "${var}" "${!var}"
+        else
+            printf '%s unset\n' "${var}"
+        fi
+    done | sort | sha256sum | cut -d ' ' -f 1
+}
 
-    echo "docker exec ${DOCKERARGS} \"${CONTAINER}\" ${COMMAND}"
+# Fingerprint the environment together with the source config files.
+compile_fingerprint() {
+    {
+        echo "${ENVIRONMENT_FINGERPRINT}"
+        if [ ${#CONFIG_SOURCES[@]} -gt 0 ]; then
+            printf "%s\n" "${CONFIG_SOURCES[@]}"
+            cat "${CONFIG_SOURCES[@]}"
+        fi
+    } | sha256sum | cut -d ' ' -f 1
 }
 
-make_cmd() {
-    if [ "$(echo "${1}" | jq -r .image)" != "null" ]; then
-        make_image_cmd "${1}"
-    elif [ "$(echo "${1}" | jq -r .container)" != "null" ]; then
-        make_container_cmd "${1}"
-    else
-        echo "${1}" | jq -r .command
+# Whether the last build is still current: the config and environment
+# fingerprint match, the variables it substituted still have the same
+# values, and every job script it wrote is still there.
+compile_cache_is_current() {
+    local fingerprint="" variables="" script
+    if [ ! -f "${COMPILED_DIR}/fingerprint" ] || [ ! -f "${COMPILED_DIR}/manifest" ]; then
+        return 1
+    fi
+    { read -r fingerprint; read -r variables; } < "${COMPILED_DIR}/fingerprint" || true
+    if [ "${fingerprint}" != "${FINGERPRINT}" ] || [ "${variables}" != "$(variables_fingerprint)" ]; then
+        return 1
     fi
+    while read -r script; do
+        if [ ! -f "${script}" ]; then
+            return 1
+        fi
+    done < "${COMPILED_DIR}/manifest"
 }
 
-parse_schedule() {
-    IFS=" " read -r -a params <<< "$@"
+# Reuse the previous build if nothing it depends on has changed.
+# Restores the job summary and onstart list recorded by save_compile_cache.
+load_compile_cache() {
+    if [ "${COMPILE_CACHE:-true}" != "true" ]; then
+        return 1
+    fi
+    if [ ! -f "${CONFIG}" ] || [ ! -f "${HOME_DIR}/crontabs/docker" ] || [ ! -f "${COMPILED_DIR}/schedule" ] || ! compile_cache_is_current; then
+        return 1
+    fi
 
-    case ${params[0]} in
-        "@yearly" | "@annually")
-            echo "0 0 1 1 *"
-            ;;
-        "@monthly")
-            echo "0 0 1 * *"
-            ;;
-        "@weekly")
-            echo "0 0 * * 0"
-            ;;
-        "@daily")
-            echo "0 0 * * *"
-            ;;
-        "@midnight")
-            echo "0 0 * * *"
-            ;;
-        "@hourly")
-            echo "0 * * * *"
-            ;;
-        "@random")
-            M="*"
-            H="*"
-            D="*"
-
-            for when in "${params[@]:1}"
-            do
-                case $when in
-                    "@m")
-                        M=$(shuf -i 0-59 -n 1)
-                        ;;
-                    "@h")
-                        H=$(shuf -i 0-23 -n 1)
-                        ;;
-                    "@d")
-                        D=$(shuf -i 0-6 -n 1)
-                        ;;
-                esac
-            done
+    ONSTART=()
+    JOB_NAMES=()
+    JOB_SCHEDULES=()
+    JOB_ONSTART_FLAGS=()
+    while IFS=$'\t' read -r schedule name onstart; do
+        JOB_SCHEDULES+=("${schedule}")
+        JOB_NAMES+=("${name}")
+        JOB_ONSTART_FLAGS+=("${onstart}")
+    done < "${COMPILED_DIR}/summary"
+    while read -r script; do
+        ONSTART+=("${script}")
+    done < "${COMPILED_DIR}/onstart"
+
+    printf "Config unchanged, reusing compiled jobs (%s)\n" "${FINGERPRINT:0:12}"
+}
+
+# Record the artifacts of a successful build alongside its fingerprint.
+save_compile_cache() {
+    mkdir -p "${COMPILED_DIR}"
+    local idx
+    for (( idx=0; idx<${#JOB_NAMES[@]}; idx++ )); do
+        printf "%s\t%s\t%s\n" "${JOB_SCHEDULES[$idx]}" "${JOB_NAMES[$idx]}" "${JOB_ONSTART_FLAGS[$idx]}"
+    done > "${COMPILED_DIR}/summary"
+    if [ ${#ONSTART[@]} -gt 0 ]; then
+        printf "%s\n" "${ONSTART[@]}"
+    fi > "${COMPILED_DIR}/onstart"
+    if [ ${#JOB_SCRIPTS[@]} -gt 0 ]; then
+        printf "%s\n" "${JOB_SCRIPTS[@]}"
+    fi > "${COMPILED_DIR}/manifest"
+    for (( idx=0; idx<${#JOB_NAMES[@]}; idx++ )); do
+        printf "%s\t%s\t%s\t%s\n" "${JOB_SCHEDULE_MASKS[$idx]}" "${JOB_SPLAYS[$idx]}" "${JOB_TIMEZONES[$idx]:--}" "${JOB_SCRIPTS[$idx]}"
+    done > "${COMPILED_DIR}/schedule"
+    for (( idx=0; idx<${#JOB_NAMES[@]}; idx++ )); do
+        printf "%s\t%s\n" "${JOB_NAMES[$idx]}" "${JOB_VARIABLES[$idx]}"
+    done > "${COMPILED_DIR}/variables"
+    for (( idx=0; idx<${#JOB_NAMES[@]}; idx++ )); do
+        if [ "${JOB_CATCHUPS[$idx]}" != "skip" ]; then
+            printf "%s\t%s\t%s\t%s\t%s\n" "${JOB_CATCHUPS[$idx]}" "${JOB_SCHEDULE_MASKS[$idx]}" \
+                "${JOB_TIMEZONES[$idx]:--}" "${JOB_NAMES[$idx]}" "${JOB_SCRIPTS[$idx]}"
+        fi
+    done > "${COMPILED_DIR}/catchup"
+    printf "%s\n%s\n" "${FINGERPRINT}" "$(variables_fingerprint)" > "${COMPILED_DIR}/fingerprint"
+    if [ "$(id -u)" = "0" ]; then
+        chown -R docker:docker "${COMPILED_DIR}"
+    fi
+}
+
+# Turn a job name into a filename-safe slug, stored in SLUG.
+# Pure parameter expansion, so no processes are spawned per job.
+slugify() {
+    local slug="${*}"
+    slug="${slug//[~^]/}"
+    slug="${slug//[^a-zA-Z0-9]/-}"
+    slug="${slug//+(-)/-}"
+    slug="${slug#-}"
+    slug="${slug%-}"
+    SLUG="${slug,,}"
+}
+
+# Apply settings and profiles to every job in the normalized config (one job
+# per line), expand matrix jobs, then validate and compile each resulting job,
+# all in a single jq pass.
+# For each job a NUL-delimited record is emitted:
+#   job <hash> <schedule> <masks> <splay> <timezone> <catchup> <name> <comment> <onstart> <variables> <command lines>
+# or, for jobs that don't match the schema:
+#   invalid <job key> <error lines>
+# With "validate" as the first argument, valid jobs are only reported as a
+# bare "valid" record; with "load", only the schedule_load of the config is
+# printed, which a compile run uses to place jobs with hashed schedules.
+# The command lines contain the main command followed by any trigger commands,
+# with image/container names already run through envsubst-style substitution,
+# and with ${VAR} in commands resolved too if RESOLVE_COMMAND_ENV=true.
+# <schedule> is the schedule with shortcuts expanded and <masks> its compiled
+# form (see schedule_masks), which is what the built-in scheduler runs on.
+# <splay> is how long to delay each run in milliseconds, or "random <bound>"
+# for a new random delay below the bound on every run (see job_splay).
+# <timezone> is the time zone the schedule is in, empty for the container's.
+# <catchup> is what to do about runs missed while the container was down.
+# <variables> lists the environment variables the command lines depend on.
+# <hash> identifies the generated script: it covers the command lines and
+# ENVIRONMENT_FINGERPRINT, so it only changes when the script content would.
+compile_jobs() {
+    local load=null zones=/dev/null
+    if [ "${1:-compile}" == "compile" ] && grep -qE '"schedule": ?"[^"]*(H|@random)|"flexible": ?"?true' "${CONFIG}" "${COMPILED_DIR}/settings.json"; then
+        load=$(compile_jobs load) || return 1
+    fi
+    # Time zone names are checked against the installed tzdata
+    if [ "${1:-compile}" != "load" ] && grep -q '"timezone"' "${CONFIG}" "${COMPILED_DIR}/settings.json"; then
+        zones="${COMPILED_DIR}/zones"
+        (cd "${ZONEINFO_DIR}" 2>/dev/null && find . -type f) > "${zones}" || true
+    fi
+    jq -n -j --arg salt "${ENVIRONMENT_FINGERPRINT}" --arg mode "${1:-compile}" --arg resolve_env "${RESOLVE_COMMAND_ENV:-false}" \
+        --arg strict "${STRICT_VALIDATION:-false}" --arg scheduler "${SCHEDULER:-crond}" --argjson load "${load}" --rawfile zones "${zones}" \
+        --slurpfile settings "${COMPILED_DIR}/settings.json" -f /dev/stdin "${CONFIG}" <<'JQ'
+def text: if type == "string" then . else tojson end;
+def envsubst: gsub("\\$(\\{(?<a>[A-Za-z_][A-Za-z0-9_]*)\\}|(?<b>[A-Za-z_][A-Za-z0-9_]*))"; $ENV[.a // .b] // "");
+def resolve_env:
+    if $resolve_env == "true" then
+        gsub("\\$\\{(?<var>[A-Za-z_][A-Za-z0-9_]*)\\}"; .var as $var | if $ENV | has($var) then $ENV[$var] else "${\($var)}" end)
+    else .
+    end;
+def variables:
+    [(., (.trigger // [])[])
+     | ((.image, .container, (.dockerargs | arrays[]?), .dockerargs, ((.environment, .expose, .networks, .ports, .volumes) | arrays[]))
+        | strings | scan("\\$\\{?([A-Za-z_][A-Za-z0-9_]*)") | .[0]),
+       (select($resolve_env == "true") | .command | strings | scan("\\$\\{([A-Za-z_][A-Za-z0-9_]*)\\}") | .[0])]
+    | unique
+    | join(" ");
+# Split a string into words the way the shell would, honouring quotes and
+# backslashes. A "$" or "`" that is quoted or escaped becomes NUL or \u0002 so
+# it is left alone, a "$" inside double quotes becomes \u0003 so its
+# expansion isn't split into words, an unquoted "~" starting a word becomes
+# \u0001 for tilde expansion and every opening quote adds a \u0005, so that
+# quoted empty words are kept. Inside double quotes a backslash only escapes
+# the characters the shell lets it. The final state is kept so unterminated
+# quotes can be reported.
+def literal: if . == "$" then "\u0000" elif . == "`" then "\u0002" else . end;
+def split_words:
+    reduce (explode[] | [.] | implode) as $c ({ words: [], word: null, quote: null, escape: false };
+        if .escape == "\"" then
+            .escape = false
+            | if $c | IN("$", "`", "\"", "\\") then .word += ($c | literal) elif $c == "\n" then . else .word += "\\" + $c end
+        elif .escape then .escape = false | if $c == "\n" then . else .word += ($c | literal) end
+        elif .quote == "'" then if $c == "'" then .quote = null else .word += ($c | literal) end
+        elif .quote == "\"" then if $c == "\"" then .quote = null elif $c == "\\" then .escape = "\"" elif $c == "$" then .word += "\u0003" else .word += $c end
+        elif $c == "'" or $c == "\"" then .quote = $c | .word += "\u0005"
+        elif $c == "\\" then .escape = true | .word += ""
+        elif $c == " " or $c == "\t" or $c == "\n" then (if .word != null then .words += [.word] | .word = null else . end)
+        elif $c == "~" and .word == null then .word = "\u0001"
+        else .word += $c
+        end);
+def shell_words: split_words | .words + (if .word != null then [.word] else [] end);
+# A leading \u0001 stays unquoted, so the shell expands ~ when the job runs
+def shell_quote:
+    if startswith("\u0001") then "~" + (.[1:] | if . == "" then . else shell_quote end)
+    elif test("^[A-Za-z0-9_./:=@%+,-]+$") then .
+    else @sh
+    end;
+
+# $VAR and ${VAR} are substituted at compile time. A leading ~ is marked
+# with \u0001 and left for the shell to expand as the HOME of the user the
+# job runs as.
+def tilde: if test("^\u0001(/|$)") then . else gsub("\u0001"; "~") end;
+def expand: sub("^~(?=/|$)"; "\u0001") | envsubst;
+# Expand a dockerargs word: like the shell, an unquoted expansion is split
+# into words at whitespace and dropped if it is empty, a double-quoted one
+# isn't
+def expand_word:
+    gsub("\\$(\\{(?<a>[A-Za-z_][A-Za-z0-9_]*)\\}|(?<b>[A-Za-z_][A-Za-z0-9_]*))"; $ENV[.a // .b] // "" | gsub("[ \t\n]+"; "\u0004"))
+    | gsub("\u0003(\\{(?<a>[A-Za-z_][A-Za-z0-9_]*)\\}|(?<b>[A-Za-z_][A-Za-z0-9_]*))"; $ENV[.a // .b] // "")
+    | split("\u0004")[]
+    | select(. != "")
+    | gsub("\u0005"; "") | gsub("[\u0000\u0003]"; "$") | gsub("\u0002"; "`");
+# Command substitution and ${VAR...} forms other than ${VAR} can't be
+# substituted at compile time. Values using them are written to the job
+# script as they are, for the shell to expand when the job runs, as {raw}.
+def unsupported_expansion: test("[$\u0003]\\(|`|[$\u0003]\\{(?![A-Za-z_][A-Za-z0-9_]*\\})");
+def run_time: { raw: . };
+
+# docker arguments as an argv: dockerargs is tokenized at compile time, and
+# every other value is one word, all with environment variables substituted
+def docker_args:
+    if . == null then []
+    elif type == "array" then map(text | if unsupported_expansion then run_time else expand end)
+    elif text | any(shell_words[]; unsupported_expansion) then [text | run_time]
+    else [text | shell_words[] | tilde | expand_word]
+    end;
+def flags($flag):
+    if . == null then []
+    elif type == "array" then map($flag, (text | if unsupported_expansion then run_time else expand end))
+    else [$flag, (text | if unsupported_expansion then run_time else expand end)]
+    end;
+def argument: if type == "object" then .raw | shell_words[] | gsub("[\u0001\u0005]"; "") else . end;
+def command_line: map(if type == "object" then .raw else shell_quote end);
+
+def image_cmd:
+    . as $job
+    | (.dockerargs | docker_args) as $args
+    | ["docker", "run"]
+      + (if any($args[] | argument; . == "--rm" or startswith("--rm=")) then [] else ["--rm"] end)
+      + $args
+      + (.environment | flags("--env"))
+      + (.expose | flags("--expose"))
+      + (if .name != null then ["--name", (.name | text)] else [] end)
+      + (.networks | flags("--network"))
+      + (.ports | flags("--publish"))
+      + (.volumes | flags("--volume"))
+      + [.image | text | if unsupported_expansion then "\"\(.)\"" | run_time else envsubst end]
+    | command_line + [$job.command | text | resolve_env]
+    | join(" ");
+
+def container_cmd:
+    . as $job
+    | ["docker", "exec"] + (.dockerargs | docker_args) + [.container | text | if unsupported_expansion then "\"\(.)\"" | run_time else envsubst end]
+    | command_line + [$job.command | text | resolve_env]
+    | join(" ");
+
+def cmd:
+    if .image != null then image_cmd
+    elif .container != null then container_cmd
+    else .command | text | resolve_env
+    end;
+
+def triggers:
+    if .trigger == null then empty
+    else .trigger as $t | $t | keys[] | $t[.] | select(.command != null) | cmd
+    end;
+
+# Two polynomial string hashes, printed as 12 hex digits
+def hex($width): [limit($width; recurse(. / 16 | floor)) | . % 16 | "0123456789abcdef"[.:. + 1]] | reverse | join("");
+def hash:
+    explode
+    | reduce .[] as $c ([7, 11]; [(.[0] * 31 + $c) % 2147483647, (.[1] * 131 + $c) % 2147483629])
+    | map(hex(6))
+    | join("");
+
+# ~~shared-settings, then the (already resolved) profiles named in extends in
+# order, then the job itself. Jobs naming unknown profiles keep their extends
+# key for job_errors to report.
+def profile_names: if type == "string" then [.] else . end;
+def apply_settings:
+    if type != "object" then .
+    else (.extends // [] | profile_names) as $extends
+    | if ($extends | type) == "array" and all($extends[]; type == "string" and $settings[0].profiles[.] != null) then
+        reduce $extends[] as $name ($settings[0].shared; . + $settings[0].profiles[$name]) + del(.extends)
+      else $settings[0].shared + .
+      end
+    end;
 
-            echo "${M} ${H} * * ${D}"
+# One job per combination of matrix values, with {{var}} replaced in every
+# string. Values of variables not used in the name are appended to it.
+def expand_matrix:
+    if type == "object" and (.matrix | type) == "object" and .matrix != {}
+        and all(.matrix | keys[]; test("^[A-Za-z_][A-Za-z0-9_]*$"))
+        and all(.matrix[]; type == "array" and length > 0 and all(.[]; type == "string" or type == "number"))
+    then
+        .name as $name
+        | del(.matrix) as $job
+        | [.matrix | to_entries[] | .key as $var | [.value[] | { ($var): tostring }]]
+        | combinations
+        | add as $vars
+        | $job
+        | walk(if type == "string" then gsub("\\{\\{ *(?<var>[A-Za-z_][A-Za-z0-9_]*) *\\}\\}"; $vars[.var] // "{{\(.var)}}") else . end)
+        | if ($name | type) == "string" then
+            .name += ([$vars | to_entries[] | .key as $var
+                | select($name | test("\\{\\{ *" + $var + " *\\}\\}") | not) | " " + .value] | join(""))
+          else .
+          end
+    else .
+    end;
+
+# Schedules: shortcuts are expanded into five cron fields, and every field is
+# compiled into the list of values it matches, or null if it is malformed.
+def cron_fields: [
+    ["minute", 0, 59, []],
+    ["hour", 0, 23, []],
+    ["day of month", 1, 31, []],
+    ["month", 1, 12, ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]],
+    ["day of week", 0, 7, ["sun", "mon", "tue", "wed", "thu", "fri", "sat"]]
+];
+def cron_value($min; $names):
+    if test("^[0-9]+$") then tonumber
+    else . as $name | ($names | indices($name))[0] | if . == null then null else . + $min end
+    end;
+def cron_values($min; $max; $names):
+    if . == "*" then [range($min; $max + 1)]
+    elif test("^[0-9]+$") then tonumber | if $min <= . and . <= $max then [.] else null end
+    else
+        [split(",")[] | ascii_downcase
+         | first(capture("^(?<range>\\*|(?<from>[0-9]+|[a-z]+)(-(?<to>[0-9]+|[a-z]+))?)(/(?<step>[1-9][0-9]*))?$"), null)
+         | if . == null then null
+           else (if .range == "*" then $min else .from | cron_value($min; $names) end) as $from
+           | (if .range == "*" then $max elif .to != null then .to | cron_value($min; $names) elif .step != null then $max else $from end) as $to
+           | if $from == null or $to == null or $from < $min or $to > $max or $from > $to then null
+             else [range($from; $to + 1; .step // "1" | tonumber)]
+             end
+           end]
+        | if any(.[]; . == null) then null else add end
+    end;
+def expand_shortcut:
+    (split(" ") | map(select(. != ""))) as $fields
+    | if $fields[0] == "@random" then
+        [(if any($fields[]; . == "@m") then "H" else "*" end),
+         (if any($fields[]; . == "@h") then "H" else "*" end),
+         "*",
+         "*",
+         (if any($fields[]; . == "@d") then "H" else "*" end)]
+        | join(" ")
+      else {
+            "@yearly": "0 0 1 1 *",
+            "@annually": "0 0 1 1 *",
+            "@monthly": "0 0 1 * *",
+            "@weekly": "0 0 * * 0",
+            "@daily": "0 0 * * *",
+            "@midnight": "0 0 * * *",
+            "@hourly": "0 * * * *"
+        }[$fields[0]] // ($fields | join(" "))
+      end;
+
+# Hashed fields (H, H/<step>, H(<from>-<to>) and H(<from>-<to>)/<step>) stand
+# for values picked from a hash of the job name, so they stay the same from
+# one build to the next. A bare H picks from 1-28 for the day of month and 0-6
+# for the day of week. The hash decides which value (or which offset of a
+# step) is tried first; for minutes and hours the candidate with the fewest
+# runs per day of the jobs compiled so far is taken, so hashed jobs spread
+# out instead of piling up.
+def hashed_field: first(capture("^H(\\((?<from>[0-9]+)-(?<to>[0-9]+)\\))?(/(?<step>[1-9][0-9]*))?$"), null);
+def hashed_candidates($field_name; $min; $max):
+    (.from // $min | tonumber) as $from
+    | (.to // ({"day of month": 28, "day of week": 6}[$field_name] // $max) | tonumber) as $to
+    | if $from < $min or $to > $max or $from > $to then null
+      elif .step == null then [range($from; $to + 1) | [.]]
+      else (.step | tonumber) as $step | [range($from; $from + $step) | select(. <= $to) | [range(.; $to + 1; $step)]]
+      end;
+def name_hash: explode | reduce .[] as $c (7; (. * 31 + $c) % 2147483647) | . * 48271 % 2147483647;
+def least_loaded($start; $load):
+    . as $candidates
+    | [range(length) as $i | ($start + $i) % ($candidates | length) | [([$candidates[.][] | $load[.] // 0] | add), $i, .]]
+    | min
+    | $candidates[.[2]];
+def hashed_values($key; $load):
+    . as [$field, [$field_name, $min, $max, $names]]
+    | ($field | hashed_field) as $hashed
+    | if $hashed == null then $field
+      else $hashed | hashed_candidates($field_name; $min; $max)
+        | least_loaded("\($field_name) \($key)" | name_hash; $load)
+        | map(tostring) | join(",")
+      end;
+def is_hashed: split(" ") | any(.[]; startswith("H"));
+
+# A valid expanded schedule with its hashed fields replaced by the values
+# picked for job $key, given the load from schedule_load (or null to go by the
+# hash alone).
+def resolve_hashed($key; $load):
+    [split(" "), cron_fields] | transpose as $fields
+    | [($fields[0] | hashed_values($key; $load.minutes)), ($fields[1] | hashed_values($key; $load.hours)), ($fields[2:][] | hashed_values($key; null))]
+    | join(" ");
+
+# Flexible jobs (flexible: true) don't care about the exact minute they run
+# at: a fixed minute, as in @hourly or @daily, becomes H and a */<step> minute
+# H/<step>, so that they are spread like hashed jobs.
+def spread_flexible:
+    if type == "object" and (.flexible | IN(true, "true")) and (.schedule | type) == "string" then
+        (.schedule | expand_shortcut | split(" ")) as $fields
+        | if ($fields | length) != 5 then .
+          elif $fields[0] | test("^[0-9]+$") and tonumber < 60 then .schedule = (["H"] + $fields[1:] | join(" "))
+          elif $fields[0] | test("^\\*/[1-9][0-9]*$") then .schedule = (["H" + $fields[0][1:]] + $fields[1:] | join(" "))
+          else .
+          end
+    else .
+    end;
+
+# Runs per day in every minute of the hour and every hour of the day, counted
+# over expanded schedules (hashed and malformed ones don't count).
+def empty_load: {minutes: [range(60) | 0], hours: [range(24) | 0]};
+def add_load($schedule; $count):
+    ($schedule | split(" ")) as $fields
+    | [($fields[0] | cron_values(0; 59; [])), ($fields[1] | cron_values(0; 23; []))] as [$minutes, $hours]
+    | if $minutes == null or $hours == null or ($fields | length) != 5 then .
+      else reduce $minutes[] as $minute (.; .minutes[$minute] = .minutes[$minute] + $count * ($hours | length))
+        | reduce $hours[] as $hour (.; .hours[$hour] = .hours[$hour] + $count * ($minutes | length))
+      end;
+def count_load: reduce to_entries[] as $entry (empty_load; add_load($entry.key; $entry.value));
+
+# The load to place hashed jobs by, plus the number of flexible jobs that
+# are spread.
+def schedule_load:
+    reduce (inputs | apply_settings | expand_matrix | objects | select(.schedule | type == "string")) as $job ({fixed: {}, flexible: 0};
+        ($job | spread_flexible | .schedule | expand_shortcut) as $fixed
+        | .fixed[$fixed] = (.fixed[$fixed] // 0) + 1
+        | if ($job.schedule | expand_shortcut) == $fixed then . else .flexible = .flexible + 1 end)
+    | (.fixed | count_load) + {flexible};
+
+# A duration such as 90s, 7m, 1h30m or 1500ms in milliseconds, or null
+def duration_ms:
+    if test("^([0-9]+(ms|s|m|h))+$") then
+        [scan("([0-9]+)(ms|s|m|h)") | (.[0] | tonumber) * {"ms": 1, "s": 1000, "m": 60000, "h": 3600000}[.[1]]] | add
+    else null
+    end;
+
+# An expanded schedule as "cron <minute> <hour> <day of month> <month>
+# <day of week> <day_or>": one bitmask per field, in hex since masks of up to
+# 60 bits don't fit into a jq number, where bit n is set if the field matches
+# n (Sunday is always bit 0). day_or is 1 if both day fields are restricted,
+# in which case either may match as in Vixie cron. @reboot compiles to
+# "reboot" and @every to "every <interval in milliseconds>".
+def mask_hex:
+    reduce .[] as $value ([range(16) | 0]; .[$value / 4 | floor] += pow(2; $value % 4))
+    | map("0123456789abcdef"[. : . + 1])
+    | "0x" + (reverse | join(""));
+def schedule_masks:
+    if . == "@reboot" then "reboot"
+    elif startswith("@every ") then "every \(.[7:] | duration_ms)"
+    else split(" ") as $fields
+    | [[$fields, cron_fields] | transpose[] | . as [$field, [$field_name, $min, $max, $names]] | $field | cron_values($min; $max; $names)]
+    | .[4] |= (map(. % 7) | unique)
+    | "cron " + (map(mask_hex) | join(" "))
+        + (if ($fields[2] | startswith("*")) or ($fields[4] | startswith("*")) then " 0" else " 1" end)
+    end;
+
+# A splay of "<duration>" delays every run of the job by the same offset
+# below the duration, taken from a hash of the job name; "random <duration>"
+# by a random offset drawn for each run. A zero duration turns splay off.
+def splay_bound: text | first(capture("^(?<random>random +)?(?<duration>[0-9a-z]+)$"), null) | if . == null then null else .bound = (.duration | duration_ms) end;
+def job_splay($key):
+    if .splay == null then "0"
+    else (.splay | splay_bound) as $splay
+    | if $splay.bound == 0 then "0"
+      elif $splay.random != null then "random \($splay.bound)" else "splay \($key)" | name_hash % $splay.bound | tostring end
+    end;
+
+# Schema checks, one message per problem
+def schedule_errors:
+    . as $schedule
+    | (split(" ") | map(select(. != ""))) as $fields
+    | if $fields[0] == "@every" then
+        if $scheduler != "builtin" then
+            "'schedule' '\(.)' is not supported by BusyBox crond, set SCHEDULER=builtin or use standard cron syntax (e.g. '*/2 * * * *' instead of '@every 2m')"
+        elif ($fields | length) != 2 or ($fields[1] | duration_ms) == null then
+            "'schedule' '\(.)' must be '@every <interval>', e.g. '@every 90s' or '@every 1h30m'"
+        elif ($fields[1] | duration_ms) < 1000 then
+            "'schedule' '\(.)' must have an interval of at least 1s"
+        else empty
+        end
+      elif $fields[0] == "@random" then
+        $fields[1:][] | select(IN("@m", "@h", "@d") | not) | "'schedule' '@random' only takes @m, @h and @d, not '\(.)'"
+      elif $fields[0] | startswith("@") then
+        if ($fields | length) == 1 and ($fields[0] | IN("@yearly", "@annually", "@monthly", "@weekly", "@daily", "@midnight", "@hourly", "@reboot")) then empty
+        else "'schedule' '\(.)' is not a supported shortcut"
+        end
+      elif ($fields | length) != 5 then
+        "'schedule' '\(.)' must have 5 fields"
+      else
+        [$fields, cron_fields] | transpose[] | . as [$field, [$field_name, $min, $max, $names]]
+        | select($field | if hashed_field != null then hashed_field | hashed_candidates($field_name; $min; $max) else cron_values($min; $max; $names) end == null)
+        | "'schedule' '\($schedule)' has an invalid \($field_name) field '\($field)'"
+      end;
+def string_field($key; $required):
+    if .[$key] == null then (if $required then "'\($key)' is missing" else empty end)
+    elif .[$key] | type == "string" then empty
+    else "'\($key)' must be a string"
+    end;
+def list_field($key):
+    if .[$key] == null or (.[$key] | type == "array" and all(.[]; type == "string" or type == "number")) then empty
+    else "'\($key)' must be an array of strings"
+    end;
+def dockerargs_errors:
+    if .dockerargs == null or (.dockerargs | type == "array" and all(.[]; type == "string")) then empty
+    elif .dockerargs | type != "string" then "'dockerargs' must be a string or an array of strings"
+    elif .dockerargs | split_words | .quote != null or .escape then "'dockerargs' has an unterminated quote or escape"
+    else empty
+    end;
+def expansion_errors($outcome):
+    [(("image", "container", "environment", "expose", "networks", "ports", "volumes") as $key
+      | .[$key] | if type == "array" then .[] else . end | strings | select(unsupported_expansion) | $key),
+     (.dockerargs | if type == "array" then .[] | strings else strings | shell_words[] end | select(unsupported_expansion) | "dockerargs")]
+    | unique[]
+    | "'\(.)' uses $(...), backticks or ${VAR...}, \($outcome)";
+# Under STRICT_VALIDATION these are errors, otherwise warnings
+def expansion_warnings:
+    def outcome: "left for the shell to expand when the job runs";
+    expansion_errors(outcome),
+    (.trigger | arrays | to_entries[] | .key as $idx | .value | objects | expansion_errors(outcome)
+        | sub("'(?<k>[a-z]+)'"; "'trigger[\($idx)].\(.k)'"));
+def job_errors($schedule_errors):
+    if type != "object" then "job must be an object"
+    else
+        string_field("schedule"; true),
+        (.schedule | strings | $schedule_errors[.][]),
+        string_field("command"; true),
+        (("name", "comment", "image", "container") as $key | string_field($key; false)),
+        dockerargs_errors,
+        (select($strict == "true") | expansion_errors("which can't be substituted at compile time")),
+        (("environment", "expose", "networks", "ports", "volumes") as $key | list_field($key)),
+        (if has("extends") | not then empty
+         elif .extends | profile_names | type == "array" and all(.[]; type == "string") then
+            .extends | profile_names[] | select($settings[0].profiles[.] == null)
+            | if . as $name | $settings[0].errors | has("~~profiles." + $name) then "'extends' refers to invalid profile '\(.)'"
+              else "'extends' refers to unknown profile '\(.)'"
+              end
+         else "'extends' must be a profile name or an array of profile names"
+         end),
+        (if has("matrix") | not then empty
+         elif .matrix | type == "object" and any(keys[]; test("^[A-Za-z_][A-Za-z0-9_]*$") | not) then
+            .matrix | keys[] | select(test("^[A-Za-z_][A-Za-z0-9_]*$") | not) | "'matrix' variable '\(.)' must be a name of letters, digits and underscores"
+         else "'matrix' must map variable names to non-empty arrays of strings or numbers"
+         end),
+        (if .onstart == null or (.onstart | IN(true, false, "true", "false")) then empty else "'onstart' must be true or false" end),
+        (if .splay == null or (.splay | type == "string" and splay_bound.bound >= 0) then empty else "'splay' must be a duration such as '45s' or 'random 45s'" end),
+        (if .flexible == null or (.flexible | IN(true, false, "true", "false")) then empty else "'flexible' must be true or false" end),
+        (if .catchup == null then empty
+         elif .catchup | IN("skip", "once", "all") | not then "'catchup' must be skip, once or all"
+         elif .catchup != "skip" and (.schedule | strings | startswith("@every") or . == "@reboot") then "'catchup' only applies to cron schedules"
+         else empty
+         end),
+        (if .timezone == null then empty
+         elif $scheduler != "builtin" then "'timezone' is not supported by BusyBox crond, set SCHEDULER=builtin"
+         elif .timezone | type == "string" and test("^[A-Za-z0-9_+-]+(/[A-Za-z0-9_+-]+)*$") and (. as $zone | "\n" + $zones | contains("\n./\($zone)\n")) then empty
+         else "'timezone' must be a time zone name such as 'Europe/Berlin', not '\(.timezone | text)'"
+         end),
+        (if .trigger == null then empty
+         elif .trigger | type != "array" then "'trigger' must be an array"
+         else .trigger | to_entries[] | .key as $idx | .value
+            | if type != "object" then "'trigger[\($idx)]' must be an object"
+              else ((("command", "image", "container") as $key | string_field($key; false)), dockerargs_errors, (select($strict == "true") | expansion_errors("which can't be substituted at compile time")))
+                | sub("'(?<k>[a-z]+)'"; "'trigger[\($idx)].\(.k)'")
+              end
+         end)
+    end;
+
+# Schedules are checked and compiled once per distinct schedule, except that
+# hashed ones are resolved per job. After the last job, a spread pass reports
+# the minute load before and after as
+#   load <before> <after>
+# where before counts the flexible jobs that were spread at their schedule as
+# written, and every other job where it runs, as after does. Broken profiles
+# and shared settings are reported first, as invalid entries of their own.
+if $mode == "load" then schedule_load | tojson
+else ($settings[0].errors // {} | to_entries[] | ["invalid", .key, .value] | map(. + "\u0000") | join("")),
+    foreach ((foreach inputs as $input (0; . + 1; . as $position | $input | apply_settings | expand_matrix | [$position, spread_flexible, .schedule])), null)
+    as [$position, $job, $written] ({errors: {}, masks: {}, load: $load, before: $load};
+    if ($job | type) == "object" and ($job.schedule | type) == "string" then
+        $job.schedule as $schedule
+        | if .errors | has($schedule) then . else .errors[$schedule] = [$schedule | schedule_errors] end
+        | if $mode != "validate" and .errors[$schedule] == [] then
+            ($schedule | expand_shortcut) as $expanded
+            | if $expanded | is_hashed then
+                .load as $current
+                | ($expanded | resolve_hashed($job.name // $job.command | text; $current)) as $resolved
+                | .schedule = $resolved
+                | if .load == null then .
+                  else .load = (.load | add_load($resolved; 1))
+                    | .before = (.before | add_load(if $written == $schedule then $resolved else $written | expand_shortcut end; 1))
+                  end
+              else .schedule = $expanded
+              end
+            | .schedule as $expanded
+            | if .masks | has($expanded) then . else .masks[$expanded] = ($expanded | schedule_masks) end
+          else .
+          end
+    else .
+    end;
+    . as $schedules
+    | $job
+    | [job_errors($schedules.errors)] as $errors
+    | (if type == "object" and (.name | type) == "string" then .name else "#\($position)" end) as $key
+    | if $position == null then
+        if $mode == "compile" and $load.flexible > 0 then ["load", ($schedules.before.minutes | tojson), ($schedules.load.minutes | tojson)] else empty end
+      elif $errors != [] then
+        ["invalid", $key, ($errors | join("\n"))]
+      else
+        ([select($strict != "true") | expansion_warnings] | if . != [] then ["warning", $key, join("\n")] else empty end),
+        (if $mode == "validate" then ["valid"]
+         else ([cmd, triggers] | join("\n")) as $commands
+         | [
+             "job",
+             ($salt + $commands | hash),
+             $schedules.schedule,
+             $schedules.masks[$schedules.schedule],
+             job_splay(.name // .command | text),
+             (.timezone // ""),
+             (.catchup // "skip"),
+             (.name | text),
+             (.comment | text | gsub("[\n\r]"; "")),
+             (.onstart | text),
+             variables,
+             $commands
+           ]
+         end)
+      end
+    | map(. + "\u0000")
+    | join(""))
+end
+JQ
+}
+
+# Write a job script to a temp file next to its final path, then move it
+# into place atomically. The script takes how many milliseconds after its
+# due time it was started (0 if omitted) and records the minute it was due in
+# STATE_DIR, for plan_catch_up; runs that weren't scheduled (onstart and
+# catch-up runs) pass "-" instead and aren't recorded.
+write_job_script() {
+    {
+        echo '#!/usr/bin/env bash'
+        echo "set -e"
+        echo ""
+        echo "[ \"\${1}\" == \"-\" ] || echo \"\$(( (\${EPOCHREALTIME/./} / 1000 - \${1:-0}) / 60000 * 60 ))\" 2>/dev/null > '${STATE_DIR}/${1}' || true"
+        echo "echo \"\$(date '+%Y-%m-%d %H:%M:%S') [start] ${1}\""
+        echo "${3}"
+        echo "echo \"\$(date '+%Y-%m-%d %H:%M:%S') [end] ${1}\""
+    } > "${2}.tmp"
+    chmod +x "${2}.tmp"
+    mv "${2}.tmp" "${2}"
+}
+
+# Read the rest of an invalid record from compile_jobs into INVALID_JOBS,
+# one "<job key>: <error>" line per error.
+read_invalid_job() {
+    local key errors
+    IFS= read -r -d '' key
+    IFS= read -r -d '' errors
+    INVALID_JOBS+=("  ${key}: ${errors//$'\n'/$'\n'"  ${key}: "}")
+}
+
+# Print a warning record from compile_jobs, one line per warning.
+print_job_warning() {
+    local key warnings
+    IFS= read -r -d '' key
+    IFS= read -r -d '' warnings
+    printf "Warning: %s: %s\n" "${key}" "${warnings//$'\n'/$'\n'"Warning: ${key}: "}" >&2
+}
+
+print_invalid_jobs() {
+    printf "Found %d invalid job(s):\n" "${#INVALID_JOBS[@]}"
+    printf "%s\n" "${INVALID_JOBS[@]}"
+}
+
+# Print the job runs per day in each minute of the hour before and after
+# flexible jobs were spread, from the JSON arrays in SPREAD_BEFORE and
+# SPREAD_AFTER, with bars scaled to the busiest minute.
+print_spread_histogram() {
+    local before after minute peak=1 width=24 bar
+    IFS=, read -r -a before <<< "${SPREAD_BEFORE//[\[\]]/}"
+    IFS=, read -r -a after <<< "${SPREAD_AFTER//[\[\]]/}"
+    for (( minute=0; minute<60; minute++ )); do
+        if (( before[minute] > peak )); then peak=${before[minute]}; fi
+        if (( after[minute] > peak )); then peak=${after[minute]}; fi
+    done
+    printf -v bar "%${width}s" ""
+    bar="${bar// /#}"
+    printf "\nSpread flexible jobs, job runs per day by minute of the hour:\n"
+    printf "  %-4s %*s %-*s  %*s %s\n" "min" 7 "before" "${width}" "" 7 "after" ""
+    for (( minute=0; minute<60; minute++ )); do
+        printf "  :%02d  %7d %-*s  %7d %s\n" "${minute}" \
+            "${before[minute]}" "${width}" "${bar:0:$(( (before[minute] * width + peak - 1) / peak ))}" \
+            "${after[minute]}" "${bar:0:$(( (after[minute] * width + peak - 1) / peak ))}"
+    done
+}
+
+# The crontab command prefix that delays a job by splay $1 (see compile_jobs),
+# stored in SPLAY_COMMAND, and the script argument that passes the delay on in
+# milliseconds (see write_job_script), stored in SPLAY_ARGUMENT. BusyBox sh has
+# $RANDOM but no fractional arithmetic, so random splays are drawn in whole
+# seconds.
+splay_command() {
+    case "$1" in
+        0)
+            SPLAY_COMMAND=""
+            SPLAY_ARGUMENT=""
             ;;
-        "@every")
-            echo "Error: '@every' schedule is not supported by BusyBox crond. Use standard cron syntax (e.g., '*/2 * * * *' instead of '@every 2m')." >&2
-            return 1
+        random\ *)
+            SPLAY_COMMAND="splay=\$(( RANDOM * $(( (${1#random } + 999) / 1000 )) / 32768 )); sleep \${splay}; "
+            SPLAY_ARGUMENT=" \${splay}000"
             ;;
         *)
-            echo "${params[@]}"
+            printf -v SPLAY_COMMAND "sleep %d.%03d; " $(( $1 / 1000 )) $(( $1 % 1000 ))
+            SPLAY_ARGUMENT=" $1"
             ;;
     esac
 }
 
 function build_crontab() {
-    rm -rf "${CRONTAB_FILE}"
+    rm -rf "${CRONTAB_FILE}" "${COMPILED_DIR}/fingerprint"
 
+    # Scripts that must survive garbage collection. While crond is running it
+    # may still fire jobs from the crontab being replaced, so keep those too.
+    local -A live_scripts=()
+    if [ -n "${KEEP_PREVIOUS_SCRIPTS}" ] && [ -f "${COMPILED_DIR}/manifest" ]; then
+        while read -r path; do
+            live_scripts["${path}"]=1
+        done < "${COMPILED_DIR}/manifest"
+    fi
+
+    local -A assigned_names=() collision_counts=()
+    local crontab="" rebuilt reused=0 removed=0
     ONSTART=()
     JOB_NAMES=()
     JOB_SCHEDULES=()
+    JOB_SCHEDULE_MASKS=()
+    JOB_SPLAYS=()
+    JOB_TIMEZONES=()
+    JOB_CATCHUPS=()
     JOB_ONSTART_FLAGS=()
-    while read -r i ; do
-        KEY=$(jq -r .["$i"] "${CONFIG}")
-
-        SCHEDULE=$(echo "${KEY}" | jq -r '.schedule')
-        if [ "${SCHEDULE}" == "null" ]; then
-            echo "'schedule' missing: '${KEY}'"
+    JOB_SCRIPTS=()
+    JOB_VARIABLES=()
+    INVALID_JOBS=()
+    SPREAD_BEFORE=""
+    SPREAD_AFTER=""
+    local pending_names=() pending_paths=() pending_commands=()
+    while IFS= read -r -d '' STATUS; do
+        if [ "${STATUS}" == "invalid" ]; then
+            read_invalid_job
             continue
-        fi
-        if ! SCHEDULE=$(parse_schedule "${SCHEDULE}"); then
-            echo "Skipping job: unsupported schedule"
+        elif [ "${STATUS}" == "warning" ]; then
+            print_job_warning
             continue
-        fi
-
-        COMMAND=$(echo "${KEY}" | jq -r '.command')
-        if [ "${COMMAND}" == "null" ]; then
-            echo "'command' missing: '${KEY}'"
+        elif [ "${STATUS}" == "load" ]; then
+            IFS= read -r -d '' SPREAD_BEFORE
+            IFS= read -r -d '' SPREAD_AFTER
             continue
         fi
+        IFS= read -r -d '' SCRIPT_HASH
+        IFS= read -r -d '' SCHEDULE
+        IFS= read -r -d '' SCHEDULE_MASKS
+        IFS= read -r -d '' SPLAY
+        IFS= read -r -d '' TIMEZONE
+        IFS= read -r -d '' CATCHUP
+        IFS= read -r -d '' SCRIPT_NAME
+        IFS= read -r -d '' COMMENT
+        IFS= read -r -d '' ONSTART_COMMAND
+        IFS= read -r -d '' JOB_VARS
+        IFS= read -r -d '' CRON_COMMAND
 
-        COMMENT=$(echo "${KEY}" | jq -r '.comment' | tr -d '\n\r')
-
-        SCRIPT_NAME=$(echo "${KEY}" | jq -r '.name')
-        SCRIPT_NAME=$(slugify "${SCRIPT_NAME}")
+        slugify "${SCRIPT_NAME}"
+        SCRIPT_NAME="${SLUG}"
         if [ "${SCRIPT_NAME}" == "null" ] || [ -z "${SCRIPT_NAME}" ]; then
-            SCRIPT_NAME=$(cat /proc/sys/kernel/random/uuid)
+            SCRIPT_NAME=job
         fi
 
-        CRON_COMMAND=$(make_cmd "${KEY}")
-
-        SCRIPT_PATH="${HOME_DIR}/jobs/${SCRIPT_NAME}.sh"
-
-        # Detect slug collisions and append counter suffix
-        if [ -f "${SCRIPT_PATH}" ]; then
-            COLLISION_COUNT=1
-            while [ -f "${HOME_DIR}/jobs/${SCRIPT_NAME}-${COLLISION_COUNT}.sh" ]; do
+        # Detect slug collisions with jobs already compiled in this build and append counter suffix.
+        # The next suffix to try is remembered per slug, so suffixes are assigned in config
+        # order without re-probing the ones already handed out.
+        if [ -n "${assigned_names[${SCRIPT_NAME}]}" ]; then
+            COLLISION_COUNT=${collision_counts[${SCRIPT_NAME}]:-1}
+            while [ -n "${assigned_names[${SCRIPT_NAME}-${COLLISION_COUNT}]}" ]; do
                 COLLISION_COUNT=$((COLLISION_COUNT + 1))
             done
+            collision_counts["${SCRIPT_NAME}"]=$((COLLISION_COUNT + 1))
             SCRIPT_NAME="${SCRIPT_NAME}-${COLLISION_COUNT}"
-            SCRIPT_PATH="${HOME_DIR}/jobs/${SCRIPT_NAME}.sh"
-        fi
-
-        # Build script content in temp file, then move atomically
-        SCRIPT_TMP=$(mktemp)
-        trap 'rm -f "${SCRIPT_TMP}"' EXIT
-        {
-            echo '#!/usr/bin/env bash'
-            echo "set -e"
-            echo ""
-            echo "echo \"\$(date '+%Y-%m-%d %H:%M:%S') [start] ${SCRIPT_NAME}\""
-            echo "${CRON_COMMAND}"
-        } > "${SCRIPT_TMP}"
-
-        TRIGGER=$(echo "${KEY}" | jq -r '.trigger')
-        if [ "${TRIGGER}" != "null" ]; then
-            while read -r j ; do
-                TRIGGER_KEY=$(echo "${KEY}" | jq -r .trigger["$j"])
-
-                TRIGGER_COMMAND=$(echo "${TRIGGER_KEY}" | jq -r '.command')
-                if [ "${TRIGGER_COMMAND}" == "null" ]; then
-                    continue
-                fi
-
-                make_cmd "${TRIGGER_KEY}" >> "${SCRIPT_TMP}"
-            done < <(echo "${KEY}" | jq -r '.trigger | keys[]')
         fi
+        assigned_names["${SCRIPT_NAME}"]=1
+        # Scripts are content-addressed: the name and hash determine the content,
+        # so an existing script is already up to date
+        SCRIPT_PATH="${HOME_DIR}/jobs/${SCRIPT_NAME}.${SCRIPT_HASH}.sh"
 
-        echo "echo \"\$(date '+%Y-%m-%d %H:%M:%S') [end] ${SCRIPT_NAME}\"" >> "${SCRIPT_TMP}"
-
-        mv "${SCRIPT_TMP}" "${SCRIPT_PATH}"
-        trap - EXIT
-        chmod +x "${SCRIPT_PATH}"
+        if [ -f "${SCRIPT_PATH}" ]; then
+            reused=$((reused + 1))
+        elif [ -z "${live_scripts[${SCRIPT_PATH}]}" ]; then
+            pending_names+=("${SCRIPT_NAME}")
+            pending_paths+=("${SCRIPT_PATH}")
+            pending_commands+=("${CRON_COMMAND}")
+        fi
+        live_scripts["${SCRIPT_PATH}"]=1
 
         if [ "${COMMENT}" != "null" ]; then
-            echo "# ${COMMENT}" >> "${CRONTAB_FILE}"
+            crontab+="# ${COMMENT}"$'\n'
         fi
         # Redirect job output to container's stdout/stderr via PID 1's file descriptors
         # This ensures output appears in docker logs (BusyBox crond swallows pipe output)
-        echo "${SCHEDULE} ${SCRIPT_PATH} > /proc/1/fd/1 2>/proc/1/fd/2" >> "${CRONTAB_FILE}"
+        # @every jobs and jobs with a time zone only exist for the built-in scheduler
+        if [[ "${SCHEDULE_MASKS}" != every\ * ]] && [ -z "${TIMEZONE}" ]; then
+            splay_command "${SPLAY}"
+            crontab+="${SCHEDULE} ${SPLAY_COMMAND}${SCRIPT_PATH}${SPLAY_ARGUMENT} > /proc/1/fd/1 2>/proc/1/fd/2"$'\n'
+        fi
 
         JOB_NAMES+=("${SCRIPT_NAME}")
         JOB_SCHEDULES+=("${SCHEDULE}")
+        JOB_SCHEDULE_MASKS+=("${SCHEDULE_MASKS}")
+        JOB_SPLAYS+=("${SPLAY}")
+        JOB_TIMEZONES+=("${TIMEZONE}")
+        JOB_CATCHUPS+=("${CATCHUP}")
+        JOB_SCRIPTS+=("${SCRIPT_PATH}")
+        JOB_VARIABLES+=("${JOB_VARS}")
 
-        ONSTART_COMMAND=$(echo "${KEY}" | jq -r '.onstart')
         if [ "${ONSTART_COMMAND}" == "true" ]; then
             ONSTART+=("${SCRIPT_PATH}")
             JOB_ONSTART_FLAGS+=("yes")
         else
             JOB_ONSTART_FLAGS+=("")
         fi
-    done < <(jq -r '. | keys[]' "${CONFIG}")
+    done < <(compile_jobs)
+    wait "$!"
 
-    # Ensure crontab file exists even if no valid jobs were found
-    touch "${CRONTAB_FILE}"
+    if [ ${#INVALID_JOBS[@]} -gt 0 ]; then
+        print_invalid_jobs
+        if [ "${STRICT_VALIDATION:-false}" == "true" ]; then
+            echo "Strict validation is enabled, not writing any job scripts"
+            exit 1
+        fi
+        echo "Skipping the invalid job(s)"
+    fi
 
-    # Print job summary table
-    local job_count=${#JOB_NAMES[@]}
-    printf "\n"
-    printf "┌─────────────────┬─────────────────────────────────────┬─────────┐\n"
-    printf "│ %-15s │ %-35s │ %-7s │\n" "Schedule" "Job" "Onstart"
-    printf "├─────────────────┼─────────────────────────────────────┼─────────┤\n"
-    for (( idx=0; idx<job_count; idx++ )); do
-        local name="${JOB_NAMES[$idx]}"
-        # Truncate long names
-        if [ ${#name} -gt 35 ]; then
-            name="${name:0:32}..."
+    # Job scripts are independent of each other, so write them from a pool of
+    # workers. The crontab itself was assembled above in config order.
+    local workers worker_pids=() worker
+    compile_workers
+    workers=${WORKERS}
+    if [ "${workers}" -gt "${#pending_paths[@]}" ]; then
+        workers=${#pending_paths[@]}
+    fi
+    for (( worker=0; worker<workers; worker++ )); do
+        (
+            for (( idx=worker; idx<${#pending_paths[@]}; idx+=workers )); do
+                write_job_script "${pending_names[$idx]}" "${pending_paths[$idx]}" "${pending_commands[$idx]}"
+            done
+        ) &
+        worker_pids+=($!)
+    done
+    for pid in "${worker_pids[@]}"; do
+        wait "${pid}"
+    done
+    rebuilt=${#pending_paths[@]}
+
+    # Garbage collect scripts that are no longer referenced, and the state of
+    # jobs that are gone
+    for path in "${HOME_DIR}"/jobs/*; do
+        if [ -f "${path}" ] && [ -z "${live_scripts[${path}]}" ]; then
+            rm -f "${path}"
+            removed=$((removed + 1))
         fi
-        printf "│ %-15s │ %-35s │ %-7s │\n" "${JOB_SCHEDULES[$idx]}" "${name}" "${JOB_ONSTART_FLAGS[$idx]}"
     done
-    printf "└─────────────────┴─────────────────────────────────────┴─────────┘\n"
-    printf "  %d job(s) scheduled\n\n" "${job_count}"
+    for path in "${STATE_DIR}"/*; do
+        if [ -f "${path}" ] && [ -z "${assigned_names[${path##*/}]}" ]; then
+            rm -f "${path}"
+        fi
+    done
+    printf "Compiled %d job(s): %d written, %d reused, %d stale removed\n" "${#JOB_NAMES[@]}" "${rebuilt}" "${reused}" "${removed}"
+    if [ -n "${SPREAD_AFTER}" ]; then
+        print_spread_histogram
+    fi
 
-    # Copy crontab file to a directory owned by docker user
+    # Write the crontab once, then move it into a directory owned by docker user
     # BusyBox crond expects files in the crontabs directory to be named after the user
     CRONTABS_DIR="${HOME_DIR}/crontabs"
     mkdir -p "${CRONTABS_DIR}"
-    cp "${CRONTAB_FILE}" "${CRONTABS_DIR}/docker"
-    rm -f "${CRONTAB_FILE}"
+    printf "%s" "${crontab}" > "${CRONTAB_FILE}"
+    chmod 600 "${CRONTAB_FILE}"
+    mv "${CRONTAB_FILE}" "${CRONTABS_DIR}/docker"
     chmod 700 "${CRONTABS_DIR}"
-    chmod 600 "${CRONTABS_DIR}/docker"
     # Ensure ownership is correct
     if [ "$(id -u)" = "0" ]; then
         chown docker:docker "${CRONTABS_DIR}" "${CRONTABS_DIR}/docker"
     fi
 
+    save_compile_cache
+}
+
+print_job_summary() {
+    local job_count=${#JOB_NAMES[@]} width=15 schedule rule
+    # The schedule column grows to fit the longest schedule, e.g. resolved H fields
+    for schedule in "${JOB_SCHEDULES[@]}"; do
+        if [ ${#schedule} -gt "${width}" ]; then
+            width=${#schedule}
+        fi
+    done
+    printf -v rule "%$((width + 2))s" ""
+    rule="${rule// /─}"
+    printf "\n"
+    printf "┌%s┬─────────────────────────────────────┬─────────┐\n" "${rule}"
+    printf "│ %-*s │ %-35s │ %-7s │\n" "${width}" "Schedule" "Job" "Onstart"
+    printf "├%s┼─────────────────────────────────────┼─────────┤\n" "${rule}"
+    for (( idx=0; idx<job_count; idx++ )); do
+        local name="${JOB_NAMES[$idx]}"
+        # Truncate long names
+        if [ ${#name} -gt 35 ]; then
+            name="${name:0:32}..."
+        fi
+        printf "│ %-*s │ %-35s │ %-7s │\n" "${width}" "${JOB_SCHEDULES[$idx]}" "${name}" "${JOB_ONSTART_FLAGS[$idx]}"
+    done
+    printf "└%s┴─────────────────────────────────────┴─────────┘\n" "${rule}"
+    printf "  %d job(s) scheduled\n\n" "${job_count}"
+}
+
+run_onstart_jobs() {
     if [ ${#ONSTART[@]} -gt 0 ]; then
         printf "Running %d onstart job(s)...\n" "${#ONSTART[@]}"
     fi
     ONSTART_PIDS=()
     for ONSTART_COMMAND in "${ONSTART[@]}"; do
-        printf "  → %s\n" "$(basename "${ONSTART_COMMAND}" .sh)"
-        "${ONSTART_COMMAND}" > /proc/1/fd/1 2>/proc/1/fd/2 &
+        local script="${ONSTART_COMMAND##*/}"
+        printf "  → %s\n" "${script%%.*}"
+        "${ONSTART_COMMAND}" - > /proc/1/fd/1 2>/proc/1/fd/2 &
         ONSTART_PIDS+=($!)
     done
     for pid in "${ONSTART_PIDS[@]}"; do
@@ -308,19 +1199,126 @@ function build_crontab() {
             echo "Warning: onstart job (PID $pid) exited with non-zero status" >&2
         fi
     done
+}
+
 
-    printf "Cron daemon starting...\n"
+# Startup timing. Each phase records its wall time and the number of
+# processes created meanwhile, taken from the last allocated PID in
+# /proc/loadavg (per PID namespace, so inside the container it counts our
+# own processes). Reading both is fork-free.
+begin_phase() {
+    PHASE_STARTED_US=${EPOCHREALTIME//[!0-9]/}
+    read -r _ _ _ _ PHASE_STARTED_PID < /proc/loadavg
 }
 
-start_app() {
+end_phase() {
+    local now_us=${EPOCHREALTIME//[!0-9]/} now_pid elapsed_us
+    read -r _ _ _ _ now_pid < /proc/loadavg
+    elapsed_us=$((now_us - PHASE_STARTED_US))
+    STARTUP_TOTAL_US=$((${STARTUP_TOTAL_US:-0} + elapsed_us))
+    STARTUP_PROCESSES=$((${STARTUP_PROCESSES:-0} + now_pid - PHASE_STARTED_PID))
+    printf -v STARTUP_PHASES '%s"%s":{"ms":%d.%03d,"processes":%d},' "${STARTUP_PHASES}" "${1}" \
+        $((elapsed_us / 1000)) $((elapsed_us % 1000)) $((now_pid - PHASE_STARTED_PID))
+    begin_phase
+}
+
+# Print the startup report as one JSON line and save it to compiled/startup.json
+write_startup_report() {
+    local report
+    printf -v report '{"event":"startup","cached":%s,"jobs":%d,"processes":%d,"total_ms":%d.%03d,"phases":{%s}}' \
+        "${STARTUP_CACHED:-false}" "${STARTUP_JOBS:-0}" "${STARTUP_PROCESSES:-0}" \
+        $((STARTUP_TOTAL_US / 1000)) $((STARTUP_TOTAL_US % 1000)) "${STARTUP_PHASES%,}"
+    echo "${report}"
+    { echo "${report}" > "${COMPILED_DIR}/startup.json"; } 2>/dev/null || true
+}
+
+compile_config() {
     normalize_config
-    export CONFIG=${HOME_DIR}/config.working.json
     if [ ! -f "${CONFIG}" ]; then
         printf "missing generated %s. exiting.\n" "${CONFIG}"
         exit 1
     fi
+    end_phase normalize
+    build_crontab
+    end_phase build
+}
+
+# Compile the config ahead of time, e.g. in a Dockerfile RUN step. The
+# artifacts are written to HOME_DIR and reused by start_app as long as the
+# config and the environment it references are unchanged.
+compile_app() {
+    find_config
+    ENVIRONMENT_FINGERPRINT=$(environment_fingerprint)
+    FINGERPRINT=$(compile_fingerprint)
+    compile_config
+    print_job_summary
+    printf "Compiled artifacts written to %s\n" "${HOME_DIR}"
+}
+
+# Check every job against the schema without building anything, e.g. as a
+# pre-commit hook. Exits non-zero if any job is invalid.
+validate_app() {
+    normalize_config
+    INVALID_JOBS=()
+    local valid=0
+    while IFS= read -r -d '' STATUS; do
+        if [ "${STATUS}" == "invalid" ]; then
+            read_invalid_job
+        elif [ "${STATUS}" == "warning" ]; then
+            print_job_warning
+        else
+            valid=$((valid + 1))
+        fi
+    done < <(compile_jobs validate)
+    wait "$!"
+
+    if [ ${#INVALID_JOBS[@]} -gt 0 ]; then
+        print_invalid_jobs
+        exit 1
+    fi
+    printf "All %d job(s) are valid\n" "${valid}"
+}
+
+start_app() {
     if [ "${1}" == "crond" ]; then
-        build_crontab
+        case "${SCHEDULER:-crond}" in
+            crond | builtin) ;;
+            *)
+                printf "Unknown SCHEDULER '%s', expected crond or builtin\n" "${SCHEDULER}"
+                exit 1
+                ;;
+        esac
+        begin_phase
+        find_config
+        ENVIRONMENT_FINGERPRINT=$(environment_fingerprint)
+        FINGERPRINT=$(compile_fingerprint)
+        if load_compile_cache; then
+            STARTUP_CACHED=true
+            end_phase fingerprint
+        else
+            end_phase fingerprint
+            compile_config
+        fi
+        print_job_summary
+        # Before onstart jobs run, while the state is as the last run left it
+        rm -f "${COMPILED_DIR}/catchup.queue"
+        if [ -s "${COMPILED_DIR}/catchup" ]; then
+            plan_catch_up
+        fi
+        begin_phase
+        run_onstart_jobs
+        end_phase onstart
+        if [ "${SCHEDULER:-crond}" == "builtin" ]; then
+            printf "Built-in scheduler starting...\n"
+        else
+            printf "Cron daemon starting...\n"
+        fi
+    else
+        normalize_config
+        if [ ! -f "${CONFIG}" ]; then
+            printf "missing generated %s. exiting.\n" "${CONFIG}"
+            exit 1
+        fi
     fi
 
     # Filter out invalid crond flags
@@ -339,6 +1337,18 @@ start_app() {
 
     printf "%s\n" "${filtered_args[@]}"
 
+    # crond is started by a supervisor that stays around to reload the config.
+    # It finishes the startup report once crond is running. SCHEDULER=builtin
+    # runs the built-in scheduler in place of crond, ignoring the crond flags.
+    if [ "${1}" == "crond" ]; then
+        if [ "${SCHEDULER:-crond}" == "builtin" ]; then
+            filtered_args=("${BASH_SOURCE[0]}" scheduler)
+        fi
+        filtered_args=("${BASH_SOURCE[0]}" supervise "${filtered_args[@]}")
+        export STARTUP_CACHED STARTUP_PHASES STARTUP_TOTAL_US STARTUP_PROCESSES PHASE_STARTED_US PHASE_STARTED_PID
+        export STARTUP_JOBS=${#JOB_NAMES[@]}
+    fi
+
     # Run as docker user for security
     if [ "$(id -u)" = "0" ]; then
         exec su-exec docker "${filtered_args[@]}"
@@ -347,5 +1357,635 @@ start_app() {
     fi
 }
 
-printf "✨ starting crontab container ✨\n"
-start_app "${@}"
+# Rebuild the crontab after a config change without touching running jobs.
+# onstart jobs are not re-run; crond is told to re-read the crontab through
+# the cron.update file in its crontabs directory, the built-in scheduler
+# (PID $1) is sent SIGHUP.
+reload_config() {
+    find_config
+    ENVIRONMENT_FINGERPRINT=$(environment_fingerprint)
+    FINGERPRINT=$(compile_fingerprint)
+    if compile_cache_is_current; then
+        printf "Config unchanged, nothing to reload\n"
+        return
+    fi
+
+    printf "Reloading config...\n"
+    KEEP_PREVIOUS_SCRIPTS=true compile_config
+    print_job_summary
+    if [ "${SCHEDULER:-crond}" == "builtin" ]; then
+        kill -HUP "${1}"
+    else
+        echo docker > "${HOME_DIR}/crontabs/cron.update"
+    fi
+}
+
+# Forward HOME_DIR config file changes to the supervisor as SIGHUP. When
+# conf.d/ is created or removed, the watch is set up again to match.
+watch_config() {
+    local dirs file rewatch=1
+    while [ -n "${rewatch}" ]; do
+        rewatch=
+        dirs=("${HOME_DIR}")
+        if [ -d "${HOME_DIR}/conf.d" ]; then
+            dirs+=("${HOME_DIR}/conf.d")
+        fi
+        while read -r file; do
+            file="${file#"${HOME_DIR}"}"
+            case "${file##+(/)}" in
+                conf.d)
+                    kill -HUP "${1}"
+                    rewatch=1
+                    break
+                    ;;
+                config.json | config.toml | config.yml | config.yaml | ..data | conf.d/*.json | conf.d/*.toml | conf.d/*.yml | conf.d/*.yaml | conf.d/..data)
+                    kill -HUP "${1}"
+                    ;;
+            esac
+        done < <(inotifywait -q -m -e close_write,moved_to,moved_from,create,delete --format '%w%f' "${dirs[@]}")
+        kill "$!" 2>/dev/null || true
+    done
+}
+
+# Run crond (or the built-in scheduler) as a child process and reload the config on SIGHUP or, unless
+# WATCH_CONFIG=false, whenever a config file in HOME_DIR changes.
+supervise() {
+    local reload=
+    # Keep the startup report variables out of the environment of crond and the jobs
+    export -n STARTUP_CACHED STARTUP_PHASES STARTUP_TOTAL_US STARTUP_PROCESSES STARTUP_JOBS PHASE_STARTED_US PHASE_STARTED_PID
+    trap 'reload=1' HUP
+    trap 'kill -TERM "${scheduler_pid}" 2>/dev/null' TERM INT
+
+    if [ "${WATCH_CONFIG:-true}" == "true" ]; then
+        if command -v inotifywait > /dev/null; then
+            watch_config "$$" &
+            local watcher_pid=$!
+            trap 'kill "${watcher_pid}" 2>/dev/null' EXIT
+        else
+            echo "Warning: inotifywait not found, config changes are only picked up on SIGHUP"
+        fi
+    fi
+
+    "${@}" &
+    local scheduler_pid=$! status=0
+    if [ -n "${STARTUP_PHASES}" ]; then
+        end_phase handoff
+        write_startup_report
+        unset STARTUP_CACHED STARTUP_PHASES STARTUP_TOTAL_US STARTUP_PROCESSES STARTUP_JOBS PHASE_STARTED_US PHASE_STARTED_PID
+    fi
+    if [ -s "${COMPILED_DIR}/catchup.queue" ]; then
+        catch_up_missed_runs &
+    fi
+    while kill -0 "${scheduler_pid}" 2>/dev/null; do
+        # wait returns early whenever a trapped signal arrives
+        wait "${scheduler_pid}" || true
+        while [ -n "${reload}" ]; do
+            reload=
+            # Reload in a subshell so a broken config can't take down the scheduler
+            set +e
+            ( set -e; reload_config "${scheduler_pid}" )
+            local reload_status=$?
+            set -e
+            if [ "${reload_status}" -ne 0 ]; then
+                echo "Warning: reload failed, keeping the current crontab" >&2
+            fi
+        done
+    done
+    wait "${scheduler_pid}" || status=$?
+    exit "${status}"
+}
+
+# Built-in scheduler, used instead of crond with SCHEDULER=builtin. It reads
+# the schedules of the last build from compiled/schedule, already compiled
+# into bitmasks, keeps the next fire time of every job in a binary min-heap
+# and sleeps until the earliest one, so each wakeup only touches the jobs that
+# are due. Cron jobs are kept in a heap of wall clock times, @every jobs in a
+# heap of monotonic clock times. The heaps live in associative arrays: bash
+# indexed arrays are linked lists, which makes the index jumps of a heap
+# linear in its size.
+
+# Days since 1970-01-01 of a proleptic Gregorian date, stored in DAYS.
+days_from_civil() {
+    local y=$(( $1 - ($2 <= 2) )) era yoe doy
+    era=$(( (y >= 0 ? y : y - 399) / 400 ))
+    yoe=$(( y - era * 400 ))
+    doy=$(( (153 * ($2 > 2 ? $2 - 3 : $2 + 9) + 2) / 5 + $3 - 1 ))
+    DAYS=$(( era * 146097 + yoe * 365 + yoe / 4 - yoe / 100 + doy - 719468 ))
+}
+
+# Date of a day since 1970-01-01, stored in CIVIL_YEAR, CIVIL_MONTH and
+# CIVIL_DAY.
+civil_from_days() {
+    local z=$(( $1 + 719468 )) era doe yoe doy mp
+    era=$(( (z >= 0 ? z : z - 146096) / 146097 ))
+    doe=$(( z - era * 146097 ))
+    yoe=$(( (doe - doe / 1460 + doe / 36524 - doe / 146096) / 365 ))
+    doy=$(( doe - (365 * yoe + yoe / 4 - yoe / 100) ))
+    mp=$(( (5 * doy + 2) / 153 ))
+    CIVIL_DAY=$(( doy - (153 * mp + 2) / 5 + 1 ))
+    CIVIL_MONTH=$(( mp < 10 ? mp + 3 : mp - 9 ))
+    CIVIL_YEAR=$(( yoe + era * 400 + (CIVIL_MONTH <= 2) ))
+}
+
+# Offset from UTC of time zone $2 (the container's local time if empty) at
+# epoch second $1, in seconds, stored in UTC_OFFSET. Offsets only change on
+# quarter hours, so they are cached per zone and quarter hour in ZONE_OFFSETS
+# and each time zone file is only read when a new quarter hour is looked up.
+utc_offset() {
+    local key="$2 $(( $1 / 900 ))" zone
+    UTC_OFFSET=${ZONE_OFFSETS[${key}]}
+    if [ -n "${UTC_OFFSET}" ]; then
+        return
+    fi
+    if [ -n "$2" ]; then
+        TZ=$2 printf -v zone '%(%z)T' "$1"
+    else
+        printf -v zone '%(%z)T' "$1"
+    fi
+    UTC_OFFSET=$(( ${zone:0:1}1 * (10#${zone:1:2} * 3600 + 10#${zone:3:2} * 60) ))
+    if (( ${#ZONE_OFFSETS[@]} >= 10000 )); then
+        ZONE_OFFSETS=()
+    fi
+    ZONE_OFFSETS[${key}]=${UTC_OFFSET}
+}
+
+# Fill BIT_INDEXES, which maps every power of two to its exponent.
+index_bits() {
+    local bit
+    for (( bit=0; bit<63; bit++ )); do
+        BIT_INDEXES[$(( 1 << bit ))]=${bit}
+    done
+}
+
+# Index of the lowest set bit of $1, stored in LOW_BIT. BIT_INDEXES maps
+# every power of two to its exponent.
+lowest_bit() {
+    LOW_BIT=${BIT_INDEXES[$(( $1 & -$1 ))]}
+}
+
+# First local minute (counted from 1970-01-01 00:00 local time) after minute
+# $2 that matches schedule $1, stored in NEXT_MINUTE. Months that can't match
+# are skipped whole, days are stepped through without converting dates, and
+# matching hours and minutes are found with bit scans. Returns non-zero if the
+# schedule doesn't match within four years (e.g. February 30th).
+next_cron_minute() {
+    local minutes=${CRON_MINUTES[$1]} hours=${CRON_HOURS[$1]} doms=${CRON_DOMS[$1]}
+    local months=${CRON_MONTHS[$1]} dows=${CRON_DOWS[$1]} day_or=${CRON_DAY_OR[$1]}
+    local t=$(( $2 + 1 )) limit=$(( $2 + 4 * 366 * 1440 )) days day dow month_days matches rest
+    if (( !minutes || !hours )); then
+        return 1
+    fi
+    while (( t < limit )); do
+        days=$(( t / 1440 ))
+        civil_from_days "${days}"
+        if (( !(months >> CIVIL_MONTH & 1) )); then
+            days_from_civil $(( CIVIL_YEAR + CIVIL_MONTH / 12 )) $(( CIVIL_MONTH % 12 + 1 )) 1
+            t=$(( DAYS * 1440 ))
+            continue
+        fi
+        if (( CIVIL_MONTH == 2 )); then
+            month_days=$(( CIVIL_YEAR % 4 == 0 && (CIVIL_YEAR % 100 != 0 || CIVIL_YEAR % 400 == 0) ? 29 : 28 ))
+        else
+            month_days=$(( 30 + ((CIVIL_MONTH + CIVIL_MONTH / 8) & 1) ))
+        fi
+        day=${CIVIL_DAY}
+        dow=$(( (days + 4) % 7 ))
+        while (( day <= month_days )); do
+            if (( day_or )); then
+                matches=$(( (doms >> day | dows >> dow) & 1 ))
+            else
+                matches=$(( (doms >> day & dows >> dow) & 1 ))
+            fi
+            if (( matches )); then
+                # Later in the day, or the first matching hour
+                rest=$(( t / 1440 == days && hours >> (t % 1440 / 60) & 1 ? minutes >> (t % 60) : 0 ))
+                if (( rest )); then
+                    lowest_bit "${rest}"
+                    NEXT_MINUTE=$(( t + LOW_BIT ))
+                    return 0
+                fi
+                rest=$(( t / 1440 == days ? hours >> (t % 1440 / 60 + 1) << (t % 1440 / 60 + 1) : hours ))
+                if (( rest )); then
+                    lowest_bit "${rest}"
+                    NEXT_MINUTE=$(( days * 1440 + LOW_BIT * 60 ))
+                    lowest_bit "${minutes}"
+                    NEXT_MINUTE=$(( NEXT_MINUTE + LOW_BIT ))
+                    return 0
+                fi
+            fi
+            day=$(( day + 1 ))
+            days=$(( days + 1 ))
+            dow=$(( (dow + 1) % 7 ))
+        done
+        t=$(( days * 1440 ))
+    done
+    return 1
+}
+
+# Add job $3 with key $2 to heap $1 (the <heap>_KEYS, <heap>_JOBS and
+# <heap>_SIZE variables).
+heap_push() {
+    local -n keys=${1}_KEYS jobs=${1}_JOBS size=${1}_SIZE
+    local i=${size} parent
+    size=$(( size + 1 ))
+    while (( i > 0 )); do
+        parent=$(( (i - 1) / 2 ))
+        if (( keys[${parent}] <= $2 )); then
+            break
+        fi
+        keys[${i}]=${keys[${parent}]}
+        jobs[${i}]=${jobs[${parent}]}
+        i=${parent}
+    done
+    keys[${i}]=$2
+    jobs[${i}]=$3
+}
+
+# Remove the job with the smallest key from heap $1.
+heap_pop() {
+    local -n keys=${1}_KEYS jobs=${1}_JOBS size=${1}_SIZE
+    local last=$(( size - 1 )) i=0 child
+    local key=${keys[${last}]} job=${jobs[${last}]}
+    unset "keys[${last}]" "jobs[${last}]"
+    size=${last}
+    if (( last == 0 )); then
+        return
+    fi
+    while child=$(( 2 * i + 1 )); (( child < last )); do
+        if (( child + 1 < last && keys[$(( child + 1 ))] < keys[${child}] )); then
+            child=$(( child + 1 ))
+        fi
+        if (( keys[${child}] >= key )); then
+            break
+        fi
+        keys[${i}]=${keys[${child}]}
+        jobs[${i}]=${jobs[${child}]}
+        i=${child}
+    done
+    keys[${i}]=${key}
+    jobs[${i}]=${job}
+}
+
+# Milliseconds since boot, stored in MONOTONIC_MS. Unlike EPOCHREALTIME it
+# never jumps, e.g. when the clock is set, and it has a 10ms resolution.
+monotonic_ms() {
+    local uptime
+    read -r uptime _ < /proc/uptime
+    MONOTONIC_MS=$(( 10#${uptime/./} * 10 ))
+}
+
+# Epoch second at which local minute $1 of time zone $2 starts, stored in
+# EPOCH. Around a change of the UTC offset (at most one a day is assumed), a
+# minute that occurs twice because the clocks go back is stored as its first
+# occurrence, with the second in EPOCH_REPEAT (which is empty otherwise), and
+# a minute that is skipped because the clocks go forward starts at the moment
+# they do.
+minute_epoch() {
+    local seconds=$(( $1 * 60 )) before after low high middle
+    EPOCH_REPEAT=
+    utc_offset $(( seconds - 86400 )) "$2"
+    before=${UTC_OFFSET}
+    utc_offset $(( seconds + 86400 )) "$2"
+    after=${UTC_OFFSET}
+    if (( before == after )); then
+        EPOCH=$(( seconds - before ))
+        return
+    fi
+    utc_offset $(( seconds - before )) "$2"
+    if (( UTC_OFFSET == before )); then
+        EPOCH=$(( seconds - before ))
+        utc_offset $(( seconds - after )) "$2"
+        if (( UTC_OFFSET == after )); then
+            EPOCH_REPEAT=$(( seconds - after ))
+        fi
+        return
+    fi
+    utc_offset $(( seconds - after )) "$2"
+    if (( UTC_OFFSET == after )); then
+        EPOCH=$(( seconds - after ))
+        return
+    fi
+    # Skipped: find the quarter hour at which the offset changes
+    low=$(( (seconds - after) / 900 ))
+    high=$(( (seconds - before + 899) / 900 ))
+    while (( high - low > 1 )); do
+        middle=$(( (low + high) / 2 ))
+        utc_offset $(( middle * 900 )) "$2"
+        if (( UTC_OFFSET == after )); then
+            high=${middle}
+        else
+            low=${middle}
+        fi
+    done
+    EPOCH=$(( high * 900 ))
+}
+
+# Load the masks $2 of a cron schedule (see schedule_masks) as schedule $1.
+load_cron_masks() {
+    read -r _ "CRON_MINUTES[$1]" "CRON_HOURS[$1]" "CRON_DOMS[$1]" "CRON_MONTHS[$1]" \
+        "CRON_DOWS[$1]" "CRON_DAY_OR[$1]" <<< "$2"
+    CRON_MINUTES[$1]=$(( CRON_MINUTES[$1] ))
+    CRON_HOURS[$1]=$(( CRON_HOURS[$1] ))
+    CRON_DOMS[$1]=$(( CRON_DOMS[$1] ))
+    CRON_MONTHS[$1]=$(( CRON_MONTHS[$1] ))
+    CRON_DOWS[$1]=$(( CRON_DOWS[$1] ))
+}
+
+# Pick the delay in milliseconds of the next run of job $1 from its splay,
+# stored in SCHEDULER_OFFSETS.
+splay_job() {
+    local splay=${SCHEDULER_SPLAYS[$1]:-0}
+    if [[ "${splay}" == random\ * ]]; then
+        SCHEDULER_OFFSETS[$1]=$(( RANDOM * ${splay#random } / 32768 ))
+    else
+        SCHEDULER_OFFSETS[$1]=${splay}
+    fi
+}
+
+# First run of schedule $1 in time zone $2 after epoch second $3, as an epoch
+# second stored in NEXT_RUN. Returns non-zero if the schedule never matches.
+# When the clocks go back, jobs that run every hour run in both passes of the
+# repeated hour and other jobs only in the first; jobs due in an hour that is
+# skipped when the clocks go forward run as the clocks change.
+next_cron_run() {
+    local hourly=$(( CRON_HOURS[$1] == 0xffffff )) minute
+    utc_offset "$3" "$2"
+    minute=${UTC_OFFSET}
+    # Start from the earlier of the local times now and in an hour, so that
+    # minutes repeated in between are found
+    if (( hourly )); then
+        utc_offset $(( $3 + 3600 )) "$2"
+        if (( UTC_OFFSET < minute )); then
+            minute=${UTC_OFFSET}
+        fi
+    fi
+    minute=$(( ($3 + minute) / 60 ))
+    NEXT_RUN=
+    while next_cron_minute "$1" "${minute}"; do
+        minute_epoch "${NEXT_MINUTE}" "$2"
+        if (( EPOCH > $3 )); then
+            NEXT_RUN=${NEXT_RUN:-${EPOCH}}
+            NEXT_RUN=$(( EPOCH < NEXT_RUN ? EPOCH : NEXT_RUN ))
+            return 0
+        elif [ -n "${EPOCH_REPEAT}" ] && (( hourly && EPOCH_REPEAT > $3 )) && [ -z "${NEXT_RUN}" ]; then
+            # The first pass of the repeated hour may still have later runs
+            NEXT_RUN=${EPOCH_REPEAT}
+        fi
+        minute=${NEXT_MINUTE}
+    done
+    if [ -n "${NEXT_RUN}" ]; then
+        return 0
+    fi
+    return 1
+}
+
+# Queue the first run of job $1 after epoch second $2. Jobs whose schedule
+# never matches are left out of the heap.
+schedule_job() {
+    if next_cron_run "${SCHEDULER_CRON_IDS[$1]}" "${SCHEDULER_ZONES[$1]}" "$2"; then
+        splay_job "$1"
+        heap_push CRON_HEAP $(( NEXT_RUN * 1000 + SCHEDULER_OFFSETS[$1] )) "$1"
+    fi
+}
+
+# Read compiled/schedule (one "<masks><TAB><splay><TAB><timezone><TAB><script>"
+# line per job, see compile_jobs, with a timezone of "-" for the container's)
+# and queue the next run of every job. Jobs sharing a schedule share its
+# masks, and their first run is only computed once per time zone. @every
+# jobs first run one interval (plus their splay) after they are loaded, except
+# that jobs unchanged by a reload keep their phase. @reboot jobs run when the
+# scheduler starts, but not on a reload.
+load_schedule() {
+    local masks splay zone script job=0 id now interval
+    local -A ids=() first_runs=() interval_dues=()
+    for (( job=0; job<INTERVAL_HEAP_SIZE; job++ )); do
+        id=${INTERVAL_HEAP_JOBS[${job}]}
+        interval_dues["${SCHEDULER_INTERVALS[${id}]} ${SCHEDULER_SCRIPTS[${id}]}"]=${INTERVAL_HEAP_KEYS[${job}]}
+    done
+    job=0
+    CRON_HEAP_KEYS=()
+    CRON_HEAP_JOBS=()
+    CRON_HEAP_SIZE=0
+    INTERVAL_HEAP_KEYS=()
+    INTERVAL_HEAP_JOBS=()
+    INTERVAL_HEAP_SIZE=0
+    SCHEDULER_SCRIPTS=()
+    SCHEDULER_CRON_IDS=()
+    SCHEDULER_ZONES=()
+    SCHEDULER_INTERVALS=()
+    SCHEDULER_SPLAYS=()
+    SCHEDULER_OFFSETS=()
+    now=${EPOCHREALTIME%.*}
+    monotonic_ms
+    while IFS=$'\t' read -r masks splay zone script; do
+        SCHEDULER_SCRIPTS[${job}]=${script}
+        if [ "${zone}" != "-" ]; then
+            SCHEDULER_ZONES[${job}]=${zone}
+        else
+            zone=
+        fi
+        if [ "${splay}" != "0" ]; then
+            SCHEDULER_SPLAYS[${job}]=${splay}
+        fi
+        case "${masks}" in
+            reboot)
+                if [ -n "${1}" ]; then
+                    splay_job "${job}"
+                    heap_push CRON_HEAP $(( ${EPOCHREALTIME/./} / 1000 + SCHEDULER_OFFSETS[${job}] )) "${job}"
+                fi
+                job=$(( job + 1 ))
+                continue
+                ;;
+            every\ *)
+                interval=${masks#every }
+                SCHEDULER_INTERVALS[${job}]=${interval}
+                splay_job "${job}"
+                heap_push INTERVAL_HEAP "${interval_dues["${interval} ${script}"]:-$(( MONOTONIC_MS + interval + SCHEDULER_OFFSETS[${job}] ))}" "${job}"
+                job=$(( job + 1 ))
+                continue
+                ;;
+        esac
+        id=${ids[${masks}]}
+        if [ -z "${id}" ]; then
+            id=${#ids[@]}
+            ids["${masks}"]=${id}
+            load_cron_masks "${id}" "${masks}"
+        fi
+        SCHEDULER_CRON_IDS[${job}]=${id}
+        if [ -z "${first_runs["${id} ${zone}"]}" ]; then
+            first_runs["${id} ${zone}"]=never
+            if next_cron_run "${id}" "${zone}" "${now}"; then
+                first_runs["${id} ${zone}"]=${NEXT_RUN}
+            fi
+        fi
+        if [ "${first_runs["${id} ${zone}"]}" != "never" ]; then
+            splay_job "${job}"
+            heap_push CRON_HEAP $(( first_runs["${id} ${zone}"] * 1000 + SCHEDULER_OFFSETS[${job}] )) "${job}"
+        fi
+        job=$(( job + 1 ))
+    done < "${COMPILED_DIR}/schedule"
+    SCHEDULER_JOBS=${job}
+}
+
+# Run the job scripts of compiled/schedule, reloading it on SIGHUP. Output goes
+# to the container's stdout and stderr, as with crond.
+# @every jobs run at a fixed rate: each run is due exactly one interval after
+# the previous one was due, however late that one started, so runs don't
+# drift. Runs that are already over by the time they'd start (e.g. after the
+# host was suspended) are skipped.
+run_scheduler() {
+    local -A SCHEDULER_SCRIPTS=() SCHEDULER_CRON_IDS=() SCHEDULER_ZONES=() SCHEDULER_INTERVALS=()
+    local -A SCHEDULER_SPLAYS=() SCHEDULER_OFFSETS=() ZONE_OFFSETS=()
+    local -A CRON_HEAP_KEYS=() CRON_HEAP_JOBS=() INTERVAL_HEAP_KEYS=() INTERVAL_HEAP_JOBS=()
+    local -A CRON_MINUTES=() CRON_HOURS=() CRON_DOMS=() CRON_MONTHS=() CRON_DOWS=() CRON_DAY_OR=()
+    local -A BIT_INDEXES=()
+    local CRON_HEAP_SIZE=0 INTERVAL_HEAP_SIZE=0 SCHEDULER_JOBS=0 MONOTONIC_MS
+    local reload= running=1 sleep_fd now_ms wait_ms timeout job due late interval
+    index_bits
+    trap 'reload=1' HUP
+    trap 'running=' TERM INT
+    # read -t on a pipe that never gets written to sleeps without forking
+    exec {sleep_fd}<> <(:)
+
+    load_schedule started
+    printf "Scheduler loaded %d job(s)\n" "${SCHEDULER_JOBS}"
+    while [ -n "${running}" ]; do
+        if [ -n "${reload}" ]; then
+            reload=
+            load_schedule
+            printf "Scheduler loaded %d job(s)\n" "${SCHEDULER_JOBS}"
+        fi
+        now_ms=$(( ${EPOCHREALTIME/./} / 1000 ))
+        monotonic_ms
+        while (( CRON_HEAP_SIZE > 0 && CRON_HEAP_KEYS[0] <= now_ms )); do
+            job=${CRON_HEAP_JOBS[0]}
+            late=$(( now_ms - CRON_HEAP_KEYS[0] + ${SCHEDULER_OFFSETS[${job}]:-0} ))
+            heap_pop CRON_HEAP
+            "${SCHEDULER_SCRIPTS[${job}]}" "${late}" > /proc/1/fd/1 2>/proc/1/fd/2 &
+            if [ -z "${SCHEDULER_CRON_IDS[${job}]}" ]; then
+                continue
+            fi
+            # After a stall (e.g. a suspended host) skip to the current minute
+            # rather than running every missed minute. A splayed run belongs
+            # to the minute it was delayed from.
+            due=$(( now_ms - ${SCHEDULER_OFFSETS[${job}]:-0} ))
+            schedule_job "${job}" $(( due / 1000 ))
+        done
+        while (( INTERVAL_HEAP_SIZE > 0 && INTERVAL_HEAP_KEYS[0] <= MONOTONIC_MS )); do
+            job=${INTERVAL_HEAP_JOBS[0]}
+            interval=${SCHEDULER_INTERVALS[${job}]}
+            due=$(( INTERVAL_HEAP_KEYS[0] + interval ))
+            if (( due <= MONOTONIC_MS )); then
+                due=$(( due + (MONOTONIC_MS - due) / interval * interval + interval ))
+            fi
+            heap_pop INTERVAL_HEAP
+            "${SCHEDULER_SCRIPTS[${job}]}" > /proc/1/fd/1 2>/proc/1/fd/2 &
+            heap_push INTERVAL_HEAP "${due}" "${job}"
+        done
+        # Wake up at least once a second, since signals only interrupt the
+        # sleep once it is over
+        wait_ms=1000
+        if (( CRON_HEAP_SIZE > 0 && CRON_HEAP_KEYS[0] - now_ms < wait_ms )); then
+            wait_ms=$(( CRON_HEAP_KEYS[0] - now_ms ))
+        fi
+        if (( INTERVAL_HEAP_SIZE > 0 && INTERVAL_HEAP_KEYS[0] - MONOTONIC_MS < wait_ms )); then
+            wait_ms=$(( INTERVAL_HEAP_KEYS[0] - MONOTONIC_MS ))
+        fi
+        printf -v timeout '%d.%03d' $(( wait_ms / 1000 )) $(( wait_ms % 1000 ))
+        read -r -t "${timeout}" -u "${sleep_fd}" || true
+    done
+}
+
+# Work out the runs missed while the container was down, from
+# compiled/catchup (one "<policy><TAB><masks><TAB><timezone><TAB><name><TAB>
+# <script>" line per job that doesn't skip them, see save_compile_cache), and
+# queue their catch-up runs in compiled/catchup.queue, one "<name><TAB><due>
+# <TAB><script>" line per run. The queue is a file rather than an environment
+# variable as it can grow past the size limit of a single environment string
+# after a long outage. A run was missed if it was due after the last run
+# recorded in STATE_DIR and before now. Jobs that never ran have nothing to
+# catch up. "once" runs a job once however many runs it missed, as its last
+# missed run, "all" once per missed run.
+plan_catch_up() {
+    local -A CRON_MINUTES=() CRON_HOURS=() CRON_DOMS=() CRON_MONTHS=() CRON_DOWS=() CRON_DAY_OR=()
+    local -A BIT_INDEXES=() ZONE_OFFSETS=()
+    local policy masks zone name script last missed now=${EPOCHSECONDS}
+    local queue="${COMPILED_DIR}/catchup.queue"
+    index_bits
+    while IFS=$'\t' read -r policy masks zone name script; do
+        last=
+        if [ -f "${STATE_DIR}/${name}" ]; then
+            read -r last < "${STATE_DIR}/${name}" || true
+        fi
+        if [[ "${last}" != +([0-9]) ]]; then
+            continue
+        fi
+        if [ "${zone}" == "-" ]; then
+            zone=
+        fi
+        load_cron_masks 0 "${masks}"
+        missed=0
+        while next_cron_run 0 "${zone}" "${last}" && (( NEXT_RUN <= now )); do
+            missed=$(( missed + 1 ))
+            last=${NEXT_RUN}
+            if [ "${policy}" == "all" ]; then
+                printf "%s\t%s\t%s\n" "${name}" "${last}" "${script}" >&3
+            fi
+        done
+        if (( missed > 0 )); then
+            if [ "${policy}" == "once" ]; then
+                printf "%s\t%s\t%s\n" "${name}" "${last}" "${script}" >&3
+            fi
+            printf "  → %s missed %d run(s), catchup: %s\n" "${name}" "${missed}" "${policy}"
+        fi
+    done < "${COMPILED_DIR}/catchup" 3> "${queue}.tmp"
+    mv "${queue}.tmp" "${queue}"
+    if [ "$(id -u)" = "0" ]; then
+        chown docker:docker "${queue}"
+    fi
+}
+
+# Run the catch-up runs queued by plan_catch_up, recording each one's due time
+# as the job's last run before it starts, then remove the queue. At most CATCHUP_CONCURRENCY go at a
+# time, so a long outage doesn't start a burst of containers.
+catch_up_missed_runs() {
+    local name due script running=0 runs=0 limit=${CATCHUP_CONCURRENCY:-2}
+    if [[ "${limit}" != [1-9]*([0-9]) ]]; then
+        echo "Warning: CATCHUP_CONCURRENCY must be a positive integer, using 2" >&2
+        limit=2
+    fi
+    printf "Catching up missed runs...\n"
+    while IFS=$'\t' read -r name due script; do
+        if (( running >= limit )); then
+            wait -n || true
+            running=$(( running - 1 ))
+        fi
+        echo "${due}" 2>/dev/null > "${STATE_DIR}/${name}" || true
+        "${script}" - < /dev/null > /proc/1/fd/1 2>/proc/1/fd/2 &
+        running=$(( running + 1 ))
+        runs=$(( runs + 1 ))
+    done < "${COMPILED_DIR}/catchup.queue"
+    rm -f "${COMPILED_DIR}/catchup.queue"
+    wait || true
+    printf "Caught up %d missed run(s)\n" "${runs}"
+}
+
+case "${1}" in
+    compile)
+        compile_app
+        ;;
+    validate)
+        validate_app
+        ;;
+    supervise)
+        shift
+        supervise "${@}"
+        ;;
+    scheduler)
+        run_scheduler
+        ;;
+    *)
+        printf "✨ starting crontab container ✨\n"
+        start_app "${@}"
+        ;;
+esac
@@ -0,0 +1,57 @@
+#!/usr/bin/env bash
+#
+# benchmark-slugify.sh - Compare the per-job cost of job name slugification
+#
+# Times the previous pipeline-based slugify (echo | iconv | sed | sed | sed | tr)
+# against the parameter-expansion slugify in entrypoint.sh, and checks that both
+# produce the same slugs.
+#
+# Usage: ./scripts/benchmark-slugify.sh [iterations]
+
+set -euo pipefail
+shopt -s extglob
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROJECT_ROOT="$(dirname "$SCRIPT_DIR")"
+ITERATIONS="${1:-500}"
+
+NAMES=(
+  "cron with triggered commands"
+  "Regenerate Certificate then reload nginx"
+  "use an ENV from inside a container"
+  "--tenant~42^ backup (nightly)--"
+  "Ünïcode Jöb Näme"
+  "logrotate"
+)
+
+# The slugify implementation used before it became fork-free
+slugify_pipeline() {
+  echo "${@}" | iconv -t ascii | sed -r s/[~^]+//g | sed -r s/[^a-zA-Z0-9]+/-/g | sed -r s/^-+\|-+$//g | tr '[:upper:]' '[:lower:]'
+}
+
+# Load the current implementation straight from the entrypoint
+# (non-ASCII names can differ: glibc iconv rejects them, musl iconv replaces them)
+eval "$(sed -n '/^slugify() {/,/^}/p' "${PROJECT_ROOT}/entrypoint.sh")"
+
+# Print the average cost per call of the given command, in microseconds
+per_call_us() {
+  local start end i
+  start=${EPOCHREALTIME/./}
+  for (( i=0; i<ITERATIONS; i++ )); do
+    "$@" "${NAMES[i % ${#NAMES[@]}]}" > /dev/null 2>&1 || true
+  done
+  end=${EPOCHREALTIME/./}
+  echo $(( (end - start) / ITERATIONS ))
+}
+
+for name in "${NAMES[@]}"; do
+  expected=$(slugify_pipeline "${name}" 2>/dev/null || true)
+  slugify "${name}"
+  if [ "${expected}" != "${SLUG}" ]; then
+    echo "note: '${name}' -> '${SLUG}' (pipeline gave '${expected}')"
+  fi
+done
+
+pipeline=$(per_call_us slugify_pipeline)
+builtin=$(per_call_us slugify)
+printf "%-28s %8s us/job\n" "pipeline (6 processes)" "${pipeline}" "parameter expansion" "${builtin}"